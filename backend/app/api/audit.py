@@ -1,14 +1,34 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 import os, time
 
+from ..audit_log import AuditWriter
+from ..audit_query import AuditIndex
+from ..core.config import settings
+
 router = APIRouter()
-LOGFILE = os.path.join(os.path.dirname(__file__), "..", "audit.log")
+LOGFILE = os.path.join(settings.DATA_DIR or os.path.join(os.path.dirname(__file__), ".."), "audit.log")
+
+# background writer: log_action only enqueues the line (see audit_log.py)
+writer = AuditWriter(
+    LOGFILE,
+    queue_size=settings.AUDIT_QUEUE_SIZE,
+    backpressure=settings.AUDIT_BACKPRESSURE,
+    block_timeout=settings.AUDIT_BLOCK_TIMEOUT,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    fsync=settings.AUDIT_FSYNC,
+    rotate_bytes=settings.AUDIT_ROTATE_BYTES,
+    rotate_daily=settings.AUDIT_ROTATE_DAILY,
+    compress=settings.AUDIT_COMPRESS,
+)
+
+# several workers append to the same file, so lines are only roughly in time order
+index = AuditIndex(LOGFILE, skew=settings.AUDIT_QUERY_SKEW)
 
 def log_action(message: str):
     ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
     line = f"{ts} {message}\n"
-    with open(LOGFILE, "a", encoding="utf-8") as f:
-        f.write(line)
+    writer.write(line)
 
 @router.post("/log")
 def api_log(payload: dict):
@@ -18,3 +38,26 @@ def api_log(payload: dict):
     detail = payload.get("detail", "")
     log_action(f"user={user} action={action} detail={detail}")
     return {"status":"ok"}
+
+
+@router.get("/log/stats")
+def api_log_stats():
+    return writer.stats()
+
+@router.get("/log/query")
+def api_log_query(start: str | None = None, end: str | None = None,
+                  user: str | None = None, action: str | None = None,
+                  limit: int = 100, cursor: str | None = None):
+    """
+    Search the audit log by time range (``YYYY-MM-DD[ HH:MM:SS]``), user and
+    action. Pass ``next_cursor`` back as ``cursor`` to get the next page.
+    """
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    # make records still sitting in the writer queue visible
+    writer.flush(timeout=1.0)
+    try:
+        items, next_cursor = index.query(start, end, user, action, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor}
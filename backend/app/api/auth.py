@@ -2,12 +2,18 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 # Importations FastAPI et dépendances
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 # Importations de notre application (modèles Pydantic et logique de DB)
 from ..models import UserCreate, UserInDB, Token, TokenData
-from ..database import get_password_hash, verify_password, get_user, create_user
+from ..database import (
+    get_password_hash, verify_and_update_password, get_user, create_user, update_user_password_hash,
+)
+from ..core.config import settings
+from ..core.hashing import hash_pool, PoolSaturated
+from ..core.token_cache import token_cache
+from ..core.ratelimit import login_limiter, keys_for, failure_keys_for
 
 # Importations pour le JWT
 from jose import JWTError, jwt
@@ -25,6 +31,8 @@ router = APIRouter(
 )
 # Définit le schéma de sécurité OAuth2 (FastAPI l'utilise pour extraire le token du header 'Authorization')
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Variante sans erreur automatique, pour les endpoints publics dont certaines options exigent un compte
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 
 # --- Fonctions Utilitaires JWT ---
@@ -40,13 +48,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
-    """Tente d'authentifier l'utilisateur."""
-    user = get_user(username)
+def _busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Serveur surchargé, réessayez dans un instant.",
+        headers={"Retry-After": "1"},
+    )
+
+async def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
+    """Tente d'authentifier l'utilisateur (bcrypt exécuté dans le pool dédié)."""
+    user = await get_user(username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    try:
+        ok, new_hash = await hash_pool.run(verify_and_update_password, password, user.hashed_password)
+    except PoolSaturated:
+        raise _busy_exception()
+    if not ok:
         return None
+    if new_hash:
+        # Le coût bcrypt a changé depuis la création du hash : on le met à jour
+        await update_user_password_hash(user.username, new_hash)
     return user
 
 
@@ -59,60 +81,103 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         detail="Les identifiants ne sont pas valides",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        # Décodage et validation du jeton
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    # Jeton déjà vérifié et non expiré : on évite de revérifier la signature
+    username = token_cache.get(token)
+    if username is None:
+        try:
+            # Décodage et validation du jeton
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
+        if payload.get("exp") is not None:
+            token_cache.put(token, username, payload["exp"])
+    token_data = TokenData(username=username)
     
     # Récupération de l'utilisateur dans la base de données
-    user = get_user(token_data.username)
-    if user is None:
+    user = await get_user(token_data.username)
+    if user is None or getattr(user, "disabled", None):
+        token_cache.invalidate_user(token_data.username)
         raise credentials_exception
     return user
 
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[UserInDB]:
+    """Dépendance : l'utilisateur authentifié, ou None sans jeton (un jeton invalide reste refusé)."""
+    if token is None:
+        return None
+    return await get_current_user(token)
+
+def require_admin(user: Optional[UserInDB]) -> None:
+    """Lève 401 sans utilisateur, 403 s'il n'est pas dans ``ADMIN_USERS``."""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentification requise.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if user.username not in settings.ADMIN_USERS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Réservé aux administrateurs.")
+
+def invalidate_user_tokens(username: str) -> None:
+    """À appeler quand un utilisateur est désactivé ou supprimé."""
+    token_cache.invalidate_user(username)
+
 
 # --- Points de Terminaison (Endpoints) ---
 
 @router.post("/register", response_model=UserInDB)
-def register_user(user_data: UserCreate):
+async def register_user(user_data: UserCreate):
     """Endpoint pour l'enregistrement d'un nouvel utilisateur."""
-    if get_user(user_data.username):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Le nom d'utilisateur est déjà pris.",
-        )
+    username_taken = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Le nom d'utilisateur est déjà pris.",
+    )
+    if await get_user(user_data.username):
+        raise username_taken
 
-    # Hashage du mot de passe
-    hashed_password = get_password_hash(user_data.password)
+    # Hashage du mot de passe (hors de la boucle d'événements)
+    try:
+        hashed_password = await hash_pool.run(get_password_hash, user_data.password)
+    except PoolSaturated:
+        raise _busy_exception()
     
     # Création du modèle pour la DB
     user_in_db = UserInDB(
         username=user_data.username,
         hashed_password=hashed_password,
-        email=user_data.email
+        email=user_data.email,
+        full_name=user_data.full_name,
     )
     
-    # Sauvegarde dans la fausse DB
-    created_user = create_user(user_in_db.__dict__) # Utilisation de .__dict__ pour simplifier l'insertion dans la fausse DB
+    # Sauvegarde en base (l'index unique protège contre deux inscriptions simultanées)
+    try:
+        created_user = await create_user(user_in_db.__dict__)
+    except ValueError:
+        raise username_taken
     
     return created_user
 
 @router.post("/login", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """Endpoint pour la connexion et l'émission d'un jeton d'accès."""
-    user = authenticate_user(form_data.username, form_data.password)
+    # Limité par IP et par nom d'utilisateur, avant tout calcul bcrypt ;
+    # les échecs ne freinent que le couple (IP, utilisateur)
+    limit_keys = keys_for(request, form_data.username)
+    failure_keys = failure_keys_for(request, form_data.username)
+    login_limiter.check(*limit_keys, *failure_keys)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
+        login_limiter.failure(*failure_keys)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Nom d'utilisateur ou mot de passe incorrect.",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    login_limiter.success(*failure_keys)
+
     # Création du jeton
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -121,6 +186,16 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.get("/hashing/stats")
+async def hashing_stats():
+    """Métriques du pool de hachage (file d'attente, temps moyens, rejets)."""
+    return hash_pool.stats()
+
+@router.get("/token-cache/stats")
+async def token_cache_stats():
+    """Compteurs du cache de jetons (hits, misses, évictions)."""
+    return token_cache.stats()
+
 @router.get("/users/me", response_model=UserInDB)
 async def read_users_me(current_user: UserInDB = Depends(get_current_user)):
     """Endpoint protégé: Récupère les informations de l'utilisateur actuel."""
@@ -1,29 +1,69 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 from typing import List
 import uuid
-import os, json
+import os, hashlib, hmac, secrets, time, json, asyncio, threading, base64, zipfile
+
+from ..ctf_store import CTFStore, SolveLedger
+from .. import ctf_bundle
+from ..scoreboard import Scoreboard, Broadcaster
+from ..core.config import settings
+from ..core import compression
+from ..core.ratelimit import flag_limiter, keys_for, failure_keys_for
+from ..models import UserInDB
+from .auth import get_optional_user, require_admin
 
 router = APIRouter()
-STORE_PATH = os.path.join(os.path.dirname(__file__), "..", "data")
+STORE_PATH = settings.DATA_DIR or os.path.join(os.path.dirname(__file__), "..", "data")
 os.makedirs(STORE_PATH, exist_ok=True)
 DB_FILE = os.path.join(STORE_PATH, "ctf_store.json")
 
-def _load():
-    if not os.path.exists(DB_FILE):
-        return {}
-    with open(DB_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+# loaded once at import; writes go to an append-only log (see ctf_store.py)
+store = CTFStore(DB_FILE, sync_interval=settings.CTF_SYNC_INTERVAL)
+# (user, challenge) -> first solve time; shared by all workers through its log file
+ledger = SolveLedger(os.path.join(STORE_PATH, "ctf_solves.log"), sync_interval=settings.CTF_SYNC_INTERVAL)
+
+def _hash_flag(flag: str, salt: str) -> str:
+    return hashlib.sha256((salt + flag).encode("utf-8")).hexdigest()
+
+def _hashed_flag_fields(flag: str) -> dict:
+    salt = secrets.token_hex(16)
+    return {"flag_salt": salt, "flag_hash": _hash_flag(flag, salt)}
+
+def _migrate_plain_flags():
+    # older stores kept the flag in clear text
+    migrated = []
+    for cid, v in store.items():
+        if "flag" in v:
+            data = {k: val for k, val in v.items() if k != "flag"}
+            data.update(_hashed_flag_fields(v["flag"]))
+            migrated.append((cid, data))
+    if migrated:
+        store.put_many(migrated)
+        # rewrite the snapshot now so the clear-text flags leave ctf_store.json
+        store.compact()
+
+_migrate_plain_flags()
+
+scoreboard = Scoreboard()
+rank_events = Broadcaster()
 
-def _save(db):
-    with open(DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(db, f, indent=2, ensure_ascii=False)
+def _on_solve(user: str, cid: str, ts: float):
+    # every first solve, recorded by this worker or read back from the shared
+    # ledger log, so each worker's scoreboard and SSE stream stay complete
+    ch = store.get(cid)
+    if ch is not None:
+        rank_events.publish(scoreboard.add(user, ch["points"], ts))
+
+# replays the solves already in the log, then follows new ones
+ledger.subscribe(_on_solve)
 
 class ChallengeCreate(BaseModel):
     title: str
     category: str  # ex: web, crypto, forensics
     description: str
-    flag: str      # store hashed in prod; plain for MVP lab
+    flag: str      # only its salted sha256 digest is stored
     points: int = 100
 
 class ChallengeOut(BaseModel):
@@ -35,25 +75,113 @@ class ChallengeOut(BaseModel):
 
 @router.post("/create", response_model=ChallengeOut)
 def create_challenge(ch: ChallengeCreate):
-    db = _load()
     cid = str(uuid.uuid4())
-    db[cid] = {
+    store.put(cid, {
         "title": ch.title,
         "category": ch.category,
         "description": ch.description,
-        "flag": ch.flag,
-        "points": ch.points
-    }
-    _save(db)
+        "points": ch.points,
+        **_hashed_flag_fields(ch.flag),
+    })
     return {"id": cid, "title": ch.title, "category": ch.category, "description": ch.description, "points": ch.points}
 
+# /list is polled by dashboards: the body is serialized once per store version,
+# compressed once per encoding, and revalidated with an ETag (If-None-Match -> 304).
+_list_cache = None  # (version, etag, {encoding: body})
+_list_lock = threading.Lock()  # concurrent pollers wait for one rebuild instead of each doing it
+
+def _list_etag(body: bytes) -> str:
+    # derived from the content, so every worker (and restart) agrees on it
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag.removeprefix("W/") for t in tags)
+
+def _list_body(encoding: str):
+    global _list_cache
+    cache = _list_cache
+    if cache is None or cache[0] != store.version or encoding not in cache[1]:
+        with _list_lock:
+            cache = _list_cache
+            if cache is None or cache[0] != store.version:
+                version, items = store.snapshot()
+                out = [{"id": k, "title": v["title"], "category": v["category"], "description": v["description"], "points": v["points"]}
+                       for k, v in items]
+                raw = json.dumps(out, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                cache = _list_cache = (version, _list_etag(raw), {"identity": raw})
+            bodies = cache[2]
+            if len(bodies["identity"]) < settings.COMPRESSION_MIN_SIZE:
+                encoding = "identity"
+            if encoding not in bodies:
+                bodies[encoding] = compression.compress(bodies["identity"], encoding)
+    _, etag, bodies = cache
+    if encoding not in bodies:
+        encoding = "identity"  # too small to be worth compressing
+    return etag, encoding, bodies[encoding]
+
+LIST_FIELDS = ("id", "title", "category", "description", "points")
+MAX_PAGE_SIZE = 1000
+
+def _encode_cursor(after: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"after": after}).encode()).decode()
+
+def _decode_cursor(cursor: str) -> int:
+    return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"])
+
 @router.get("/list", response_model=List[ChallengeOut])
-def list_challenges():
-    db = _load()
-    out = []
-    for k,v in db.items():
-        out.append({"id": k, "title": v["title"], "category": v["category"], "description": v["description"], "points": v["points"]})
-    return out
+def list_challenges(request: Request, category: str | None = None,
+                    min_points: int | None = None, max_points: int | None = None,
+                    q: str | None = None, limit: int | None = None,
+                    cursor: str | None = None, fields: str | None = None):
+    """
+    Every challenge, in creation order. Optional filters: ``category``,
+    ``min_points``/``max_points`` and ``q`` (every word must prefix a word of
+    the title or description). ``limit`` pages the result: pass the
+    ``X-Next-Cursor`` header back as ``cursor``. ``fields`` picks columns
+    (comma separated; ``id`` is always included).
+    """
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+
+    if all(v is None for v in (category, min_points, max_points, q, limit, cursor, fields)):
+        # plain poll: cached, pre-compressed body
+        encoding = compression.negotiate(request.headers.get("accept-encoding", ""))
+        etag, encoding, body = _list_body(encoding)
+        headers["ETag"] = etag
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type="application/json", headers=headers)
+
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    columns = LIST_FIELDS
+    if fields is not None:
+        wanted = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = wanted - set(LIST_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        columns = [f for f in LIST_FIELDS if f in wanted or f == "id"]
+    try:
+        after = _decode_cursor(cursor) if cursor else None
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    _, rows, next_after, total = store.query(
+        category=category, min_points=min_points, max_points=max_points, text=q, after=after, limit=limit)
+    out = [{f: (cid if f == "id" else v[f]) for f in columns} for cid, v in rows]
+    body = json.dumps(out, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    headers["ETag"] = _list_etag(body)
+    headers["X-Total-Count"] = str(total)
+    if next_after is not None:
+        next_cursor = _encode_cursor(next_after)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 class FlagCheck(BaseModel):
     id: str
@@ -61,16 +189,189 @@ class FlagCheck(BaseModel):
     user: str | None = None
 
 @router.post("/check-flag")
-def check_flag(body: FlagCheck):
-    db = _load()
-    if body.id not in db:
+def check_flag(body: FlagCheck, request: Request):
+    # throttled per client IP and per user; repeated wrong flags add a growing
+    # delay for that (IP, user) pair only, never for a whole shared IP
+    limit_keys = keys_for(request, body.user)
+    failure_keys = failure_keys_for(request, body.user)
+    flag_limiter.check(*limit_keys, *failure_keys)
+    ch = store.get(body.id)
+    if ch is None:
         raise HTTPException(status_code=404, detail="Challenge not found")
-    correct = db[body.id]["flag"]
-    ok = (body.flag == correct)
+    ok = hmac.compare_digest(_hash_flag(body.flag, ch["flag_salt"]), ch["flag_hash"])
+    if ok:
+        flag_limiter.success(*failure_keys)
+    else:
+        flag_limiter.failure(*failure_keys)
+    # a user only earns the points on the first correct submission
+    now = time.time()
+    # the scoreboard is updated by _on_solve before record() returns
+    first_solve = ok and (body.user is None or ledger.record(body.user, body.id, now))
     # log attempt (simple)
     try:
         from . import audit
         audit.log_action(f"flag-check id={body.id} user={body.user} ok={ok}")
     except Exception:
         pass
-    return {"result": "correct" if ok else "incorrect", "points": db[body.id]["points"] if ok else 0}
+    out = {"result": "correct" if ok else "incorrect", "points": ch["points"] if first_solve else 0}
+    if ok and not first_solve:
+        out["already_solved"] = True
+    return out
+
+
+# --- Bulk import / export (NDJSON or zip bundle, see ctf_bundle.py) ---
+
+IMPORT_BATCH = 500       # records written to the store per log append
+MAX_IMPORT_ERRORS = 100  # errors listed in the response (all are counted)
+CONFLICT_MODES = ("skip", "replace", "error")
+
+class ChallengeImport(BaseModel):
+    id: str | None = None
+    title: str
+    category: str
+    description: str
+    points: int = 100
+    flag: str | None = None       # plain flag, hashed on import...
+    flag_salt: str | None = None  # ... or the salted digest from /challenges/export
+    flag_hash: str | None = None
+
+def _import_data(rec: ChallengeImport) -> dict:
+    if rec.flag is not None:
+        flag_fields = _hashed_flag_fields(rec.flag)
+    elif rec.flag_salt and rec.flag_hash:
+        flag_fields = {"flag_salt": rec.flag_salt, "flag_hash": rec.flag_hash}
+    else:
+        raise ValueError("flag or flag_salt/flag_hash is required")
+    return {"title": rec.title, "category": rec.category, "description": rec.description,
+            "points": rec.points, **flag_fields}
+
+def _rescore(deltas: dict):
+    # solvers of a re-pointed challenge get its new value
+    for (user, cid), _ in ledger.items():
+        delta = deltas.get(cid)
+        if delta:
+            change = scoreboard.adjust(user, delta)
+            if change is not None:
+                rank_events.publish(change)
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc']) or 'record'}: {err['msg']}" for err in e.errors())
+
+@router.post("/challenges/import")
+def import_challenges(file: UploadFile = File(...), format: str | None = Form(None),
+                      on_conflict: str = Form("skip"), user: UserInDB | None = Depends(get_optional_user)):
+    """
+    Bulk import from NDJSON (one challenge per line) or a zip bundle as
+    produced by /challenges/export. Records are validated one by one and
+    written in batches; invalid records are reported by line number without
+    stopping the run. ``on_conflict`` handles ids that already exist:
+    ``skip``, ``replace`` (admins only; solvers' scores follow the new
+    points) or ``error``.
+    """
+    fmt = format or ctf_bundle.detect_format(file.filename, file.content_type)
+    if fmt not in ("ndjson", "zip"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'zip'")
+    if on_conflict not in CONFLICT_MODES:
+        raise HTTPException(status_code=400, detail=f"on_conflict must be one of {list(CONFLICT_MODES)}")
+    if on_conflict == "replace":
+        require_admin(user)
+
+    imported = skipped = error_count = 0
+    errors = []
+    batch = {}
+    replaced_points = {}  # id -> points before the import
+
+    def fail(line, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_IMPORT_ERRORS:
+            errors.append({"line": line, "error": message})
+
+    def flush():
+        nonlocal imported
+        store.put_many(batch.items())
+        imported += len(batch)
+        batch.clear()
+
+    try:
+        for line, record, error in ctf_bundle.iter_records(file.file, fmt):
+            if error is not None:
+                fail(line, error)
+                continue
+            try:
+                rec = ChallengeImport.model_validate(record)
+                data = _import_data(rec)
+            except ValidationError as e:
+                fail(line, _validation_message(e))
+                continue
+            except ValueError as e:
+                fail(line, str(e))
+                continue
+            cid = rec.id or str(uuid.uuid4())
+            if cid in batch or cid in store:
+                if on_conflict == "skip":
+                    skipped += 1
+                    continue
+                if on_conflict == "error":
+                    fail(line, f"id already exists: {cid}")
+                    continue
+                existing = store.get(cid)
+                if existing is not None:
+                    replaced_points.setdefault(cid, existing["points"])
+            batch[cid] = data
+            if len(batch) >= IMPORT_BATCH:
+                flush()
+    except (zipfile.BadZipFile, ValueError) as e:
+        # unreadable bundle: batches already written are kept
+        fail(None, f"unreadable {fmt} file: {e}")
+    flush()
+    _rescore({cid: store.get(cid)["points"] - points for cid, points in replaced_points.items()})
+    return {"imported": imported, "skipped": skipped, "error_count": error_count, "errors": errors}
+
+@router.get("/challenges/export")
+def export_challenges(format: str = "ndjson", include_flags: bool = False,
+                      user: UserInDB | None = Depends(get_optional_user)):
+    """
+    Stream every challenge as NDJSON or as a zip bundle. Flags are left out
+    unless ``include_flags`` is set (admins only): the salted digests can be
+    brute-forced offline.
+    """
+    if format not in ("ndjson", "zip"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'zip'")
+    if include_flags:
+        require_admin(user)
+    # a list of references to the stored dicts; serialization happens chunk by chunk
+    _, items = store.snapshot()
+    if format == "zip":
+        return StreamingResponse(ctf_bundle.export_zip(items, len(items), include_flags), media_type="application/zip",
+                                 headers={"Content-Disposition": 'attachment; filename="challenges.zip"'})
+    return StreamingResponse(ctf_bundle.export_ndjson(items, include_flags), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="challenges.ndjson"'})
+
+@router.get("/scoreboard")
+def get_scoreboard(limit: int = 10):
+    ledger.sync()  # solves made on other workers since the last poll
+    return scoreboard.top(limit)
+
+SSE_KEEPALIVE_SECONDS = 15
+
+@router.get("/scoreboard/stream")
+async def stream_scoreboard(request: Request, limit: int = 10):
+    """Server-Sent Events: the current top N, then one event per rank change."""
+    q = rank_events.subscribe()
+
+    async def events():
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(scoreboard.top(limit))}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(q.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: rank\ndata: {json.dumps(event)}\n\n"
+        finally:
+            rank_events.unsubscribe(q)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
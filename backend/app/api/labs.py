@@ -1,22 +1,70 @@
-from fastapi import APIRouter
-import subprocess, os
+from fastapi import APIRouter, HTTPException
+import os, shlex
+
+from ..core.config import settings
+from ..lab_jobs import LabScheduler, QueueFull
 
 router = APIRouter()
+DATA_DIR = settings.DATA_DIR or os.path.join(os.path.dirname(__file__), "..", "data")
+
+# one scheduler per worker; job state, per-lab dedupe and releases are shared
+# through files in lab_jobs/, and each worker gets its own warm-pool port range
+scheduler = LabScheduler(
+    compose_command=shlex.split(settings.LAB_COMPOSE_COMMAND),
+    labs_dir=settings.LAB_DIR or os.path.abspath(os.path.join(os.getcwd(), "..", "labs")),
+    max_concurrent=settings.LAB_MAX_CONCURRENT,
+    queue_size=settings.LAB_QUEUE_SIZE,
+    warm_pool_size=settings.LAB_WARM_POOL_SIZE,
+    warm_pool_lab=settings.LAB_WARM_POOL_LAB,
+    log_tail=settings.LAB_LOG_TAIL_LINES,
+    warm_port_base=settings.LAB_WARM_PORT_BASE,
+    instance_ttl=settings.LAB_INSTANCE_TTL,
+    retry_delay=settings.LAB_WARM_RETRY_DELAY,
+    retry_max_delay=settings.LAB_WARM_RETRY_MAX_DELAY,
+    state_dir=os.path.join(DATA_DIR, "lab_jobs"),
+    port_range=settings.LAB_WARM_PORTS_PER_WORKER,
+)
 
 @router.post("/deploy-simulated-lab")
-def deploy_lab(lab_name: str = "vulnerable-web"):
+async def deploy_lab(lab_name: str = "vulnerable-web"):
     """
     Déploie un lab local via docker-compose.lab.yml dans le dossier labs.
     Pour sécurité, ce point exécute uniquement des stacks définies dans /labs.
     Ne lance rien sur des réseaux externes.
+    Le déploiement est asynchrone : suivre l'avancement avec /labs/jobs/{job_id}.
     """
-    base = os.path.abspath(os.path.join(os.getcwd(), "..", "labs"))
-    compose_file = os.path.join(base, "docker-compose.lab.yml")
-    if not os.path.exists(compose_file):
+    if not scheduler.compose_file_exists():
         return {"error":"compose file missing"}
     # Appelle docker-compose en local. L'utilisateur doit exécuter dans un environnement contrôlé.
     try:
-        subprocess.check_call(["docker-compose", "-f", compose_file, "up", "-d", lab_name], cwd=base)
-        return {"status":"deployed", "lab": lab_name}
-    except subprocess.CalledProcessError as e:
-        return {"status":"error", "detail": str(e)}
+        job = scheduler.submit(lab_name)
+    except QueueFull:
+        raise HTTPException(status_code=429, detail="Trop de déploiements en attente.",
+                            headers={"Retry-After": "5"})
+    # "deployed" directement si une instance pré-démarrée a été remise (port hôte et expiration fournis)
+    return {"status": job.status, "lab": job.lab, "job_id": job.id, "project": job.project,
+            "port": job.port, "expires_at": job.expires_at}
+
+@router.get("/labs/jobs/{job_id}")
+async def lab_job_status(job_id: str, tail: int = 50):
+    """Statut d'un déploiement et dernières lignes de sortie de docker-compose."""
+    job = scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict(tail)
+
+@router.delete("/labs/jobs/{job_id}")
+async def release_lab_instance(job_id: str):
+    """Détruit une instance pré-démarrée remise par /deploy-simulated-lab (sinon détruite à expiration)."""
+    try:
+        down = scheduler.release(job_id)
+    except QueueFull:
+        raise HTTPException(status_code=429, detail="Trop de déploiements en attente.",
+                            headers={"Retry-After": "5"})
+    if down is None:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    return down.to_dict(0)
+
+@router.get("/labs/stats")
+async def lab_scheduler_stats():
+    return scheduler.stats()
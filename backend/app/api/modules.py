@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-import random
+from typing import List
+import math
+import os
 import string
 
+import numpy as np
+
 # Définition du modèle de données attendu pour la requête POST
 class PasswordRequest(BaseModel):
     """
@@ -17,33 +21,102 @@ class PasswordResponse(BaseModel):
     """
     password: str
 
+# Classes de caractères disponibles pour les politiques
+CHARACTER_CLASSES = {
+    "lower": string.ascii_lowercase,
+    "upper": string.ascii_uppercase,
+    "digits": string.digits,
+    "symbols": string.punctuation,
+}
+# Caractères faciles à confondre à l'écrit (utile pour les identifiants distribués sur papier)
+AMBIGUOUS = set("Il1O0o|`'\"")
+
+class BatchPasswordRequest(BaseModel):
+    """
+    Modèle pour la génération d'un lot de mots de passe (une cohorte de lab).
+    """
+    count: int = Field(..., ge=1, le=10000, description="Nombre de mots de passe (1 à 10000)")
+    length: int = Field(16, ge=8, le=128, description="Longueur de chaque mot de passe")
+    classes: List[str] = Field(list(CHARACTER_CLASSES), description="Classes autorisées : lower, upper, digits, symbols")
+    require_each_class: bool = Field(True, description="Au moins un caractère de chaque classe")
+    exclude_ambiguous: bool = Field(False, description="Exclure les caractères ambigus (Il1O0o...)")
+
+class GeneratedPassword(BaseModel):
+    password: str
+    entropy_bits: float
+
+class BatchPasswordResponse(BaseModel):
+    """
+    Modèle pour la réponse contenant le lot de mots de passe générés.
+    """
+    passwords: List[GeneratedPassword]
+
 # Initialisation du routeur
 router = APIRouter()
 
+def _random_indices(count: int, n: int) -> np.ndarray:
+    """
+    Tire ``count`` entiers uniformes dans [0, n) à partir d'un seul gros
+    tampon ``os.urandom``. Échantillonnage par rejet : les octets >= limit
+    sont écartés pour éviter le biais du modulo.
+    """
+    limit = 256 - 256 % n
+    out = np.empty(0, dtype=np.uint8)
+    while len(out) < count:
+        missing = count - len(out)
+        # marge pour compenser les rejets et éviter un second appel
+        raw = np.frombuffer(os.urandom(int(missing * 256 / limit * 1.1) + 16), dtype=np.uint8)
+        out = np.concatenate([out, raw[raw < limit][:missing]])
+    return out % n
+
+def generate_password_batch(count: int, length: int, classes: List[str],
+                            require_each_class: bool = True, exclude_ambiguous: bool = False) -> List[GeneratedPassword]:
+    """
+    Génère ``count`` mots de passe avec un CSPRNG (``os.urandom``), de façon vectorisée.
+    L'entropie estimée est ``longueur * log2(taille de l'alphabet réellement utilisé)``.
+    """
+    pools = []
+    for name in dict.fromkeys(classes):
+        if name not in CHARACTER_CLASSES:
+            raise ValueError(f"Classe de caractères inconnue : {name}")
+        chars = [c for c in CHARACTER_CLASSES[name] if not (exclude_ambiguous and c in AMBIGUOUS)]
+        pools.append(np.frombuffer("".join(chars).encode("ascii"), dtype=np.uint8))
+    if not pools:
+        raise ValueError("Aucune classe de caractères sélectionnée.")
+    if require_each_class and len(pools) > length:
+        raise ValueError("Longueur insuffisante pour inclure chaque classe.")
+    alphabet = np.concatenate(pools)
+
+    # Tous les caractères sont tirés dans l'alphabet complet...
+    chars = alphabet[_random_indices(count * length, len(alphabet))].reshape(count, length)
+    if require_each_class:
+        # ... puis les premières positions sont forcées à un caractère de chaque classe
+        for col, pool in enumerate(pools):
+            chars[:, col] = pool[_random_indices(count, len(pool))]
+        # et chaque ligne est mélangée : argsort de clés aléatoires 64 bits = permutation uniforme
+        keys = np.frombuffer(os.urandom(8 * count * length), dtype=np.uint64).reshape(count, length)
+        chars = np.take_along_axis(chars, np.argsort(keys, axis=1), axis=1)
+
+    # Entropie : alphabet formé des classes effectivement présentes dans chaque mot de passe
+    alphabet_size = np.zeros(count, dtype=np.int64)
+    for pool in pools:
+        present = np.isin(chars, pool).any(axis=1)
+        alphabet_size += present * len(pool)
+    bits_per_char = {int(n): length * math.log2(n) for n in np.unique(alphabet_size)}
+
+    raw = chars.tobytes().decode("ascii")
+    return [
+        GeneratedPassword(password=raw[i * length:(i + 1) * length],
+                          entropy_bits=round(bits_per_char[int(alphabet_size[i])], 1))
+        for i in range(count)
+    ]
+
 def generate_strong_password(length: int) -> str:
     """
     Génère un mot de passe aléatoire et sécurisé.
     Il assure la présence d'au moins un chiffre, une majuscule et un caractère spécial.
     """
-    # Tous les caractères possibles
-    characters = string.ascii_letters + string.digits + string.punctuation
-    
-    # Assurer au moins un de chaque type pour la robustesse (meilleur pour l'éducation)
-    password = [
-        random.choice(string.digits),
-        random.choice(string.ascii_uppercase),
-        random.choice(string.ascii_lowercase),
-        random.choice(string.punctuation),
-    ]
-    
-    # Compléter le reste de la longueur
-    for _ in range(length - 4):
-        password.append(random.choice(characters))
-        
-    # Mélanger le mot de passe pour le rendre aléatoire
-    random.shuffle(password)
-    
-    return "".join(password)
+    return generate_password_batch(1, length, list(CHARACTER_CLASSES))[0].password
 
 @router.post("/generate-password", response_model=PasswordResponse)
 async def generate_password_endpoint(request: PasswordRequest):
@@ -56,4 +129,16 @@ async def generate_password_endpoint(request: PasswordRequest):
     except Exception as e:
         # En cas d'erreur inattendue (bien que peu probable ici)
         print(f"Erreur lors de la génération: {e}")
-        raise HTTPException(status_code=500, detail="Échec de la génération du mot de passe.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Échec de la génération du mot de passe.")
+
+@router.post("/generate-passwords", response_model=BatchPasswordResponse)
+def generate_passwords_endpoint(request: BatchPasswordRequest):
+    """
+    Endpoint pour générer un lot de mots de passe selon une politique de classes de caractères.
+    """
+    try:
+        passwords = generate_password_batch(request.count, request.length, request.classes,
+                                            request.require_each_class, request.exclude_ambiguous)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BatchPasswordResponse(passwords=passwords)
@@ -1,21 +1,35 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
-import ipaddress, random
+from typing import List, Tuple
+import ipaddress, json, random
+
+import numpy as np
+
+from .. import services_catalog
 
 router = APIRouter()
 
+# sent once per response rather than on every row
+NOTE = "Simulated result for training. Aucun scan réel effectué. Interprétez ce résultat pour comprendre les ports et services."
+REPORT_FIELDS = ["port", "state", "service"]
+
 class ScanRequest(BaseModel):
     target: str  # hostname or ip (for education only)
     ports: List[int] = [22,80,443]
 
-class PortReport(BaseModel):
-    port: int
-    state: str
-    service: str | None
-    note: str | None
+class ScanReport(BaseModel):
+    note: str
+    fields: List[str]                        # column names of each row
+    rows: List[Tuple[int, str, str | None]]  # (port, state, service)
 
-@router.post("/simulate-scan", response_model=List[PortReport])
+def port_state(rand: int, port: int) -> str:
+    # common services are open more often (see services_catalog.OPEN_THRESHOLDS)
+    if rand < services_catalog.open_threshold(port):
+        return "open"
+    return "closed" if rand < 7 else "filtered"
+
+@router.post("/simulate-scan", response_model=ScanReport)
 def simulate_scan(body: ScanRequest):
     # Validate target format superficially
     try:
@@ -26,13 +40,130 @@ def simulate_scan(body: ScanRequest):
         # keep moving, do not perform any network I/O
         pass
 
-    services = {22:"ssh",80:"http",443:"https",3306:"mysql",21:"ftp"}
-    report = []
+    target_sum = sum(ord(c) for c in body.target)
+    rows = []
     for p in body.ports:
         # deterministic pseudo-random based on target+port
-        rand = (sum(ord(c) for c in body.target) + p) % 10
-        state = "open" if rand < 3 else "closed" if rand < 7 else "filtered"
-        service = services.get(p)
-        note = "Simulated result for training. Aucun scan réel effectué. Interprétez ce résultat pour comprendre les ports et services."
-        report.append({"port": p, "state": state, "service": service, "note": note})
-    return report
+        rand = (target_sum + p) % 10
+        rows.append((p, port_state(rand, p), services_catalog.service_name(p)))
+    return {"note": NOTE, "fields": REPORT_FIELDS, "rows": rows}
+
+
+# --- Bulk mode: CIDR blocks x port ranges, computed with NumPy ---
+
+MAX_BULK_ADDRESSES = 1 << 20   # a /12, or sixteen /16 sweeps
+TARGET_BATCH = 256             # max targets per NumPy batch / streamed chunk
+MAX_BATCH_CELLS = 1 << 20      # targets x ports per batch: bounds the temporary arrays (~3 MB)
+
+# sum(ord(c) for c in str(octet)) for every octet value, so the sum of a dotted
+# IPv4 string is four table lookups plus the three dots
+_OCTET_ORD_SUM = np.array([sum(ord(c) for c in str(i)) for i in range(256)], dtype=np.int64)
+_DOTS_ORD_SUM = 3 * ord(".")
+
+class BulkScanRequest(BaseModel):
+    targets: List[str]              # CIDR blocks, IPs or hostnames
+    ports: str = "22,80,443"        # ex: "1-1024,3306,8000-8100"
+    include_closed: bool = False    # closed and filtered ports are only counted by default,
+    include_filtered: bool = False  # like nmap's "Not shown: N filtered ports"
+
+def parse_ports(expr: str) -> np.ndarray:
+    """Parse a port expression such as ``22,80,1000-2000`` into a sorted array."""
+    parts = []
+    for item in expr.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        lo, sep, hi = item.partition("-")
+        lo = int(lo)
+        hi = int(hi) if sep else lo
+        if not 0 <= lo <= hi <= 65535:
+            raise ValueError(f"invalid port range: {item}")
+        parts.append(np.arange(lo, hi + 1, dtype=np.int64))
+    if not parts:
+        raise ValueError("no ports given")
+    return np.unique(np.concatenate(parts))
+
+def _expand_target(target: str):
+    """Return ``(ord sums, target labels or None, IPv4 ints or None)`` for one target."""
+    try:
+        net = ipaddress.ip_network(target, strict=False)
+    except ValueError:
+        # hostname: same hash as simulate_scan
+        return np.array([sum(ord(c) for c in target)], dtype=np.int64), [target], None
+    if net.version == 4:
+        ints = np.arange(int(net.network_address), int(net.broadcast_address) + 1, dtype=np.int64)
+        sums = (_OCTET_ORD_SUM[(ints >> 24) & 255] + _OCTET_ORD_SUM[(ints >> 16) & 255]
+                + _OCTET_ORD_SUM[(ints >> 8) & 255] + _OCTET_ORD_SUM[ints & 255] + _DOTS_ORD_SUM)
+        return sums, None, ints
+    labels = [str(ip) for ip in net]
+    return np.array([sum(ord(c) for c in label) for label in labels], dtype=np.int64), labels, None
+
+def _ipv4_label(n: int) -> str:
+    return f"{n >> 24 & 255}.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+def _scan_rows(targets, ports: np.ndarray, include_closed: bool, include_filtered: bool):
+    # only (sum + port) % 10 matters, so everything fits in uint8
+    open_thresholds = services_catalog.TCP_OPEN_THRESHOLD[ports].astype(np.uint8)
+    port_digits = (ports % 10).astype(np.uint8)
+    batch_size = max(1, min(TARGET_BATCH, MAX_BATCH_CELLS // len(ports)))
+    # header line: shared strings, sent once for the whole sweep
+    services = {int(p): services_catalog.service_name(int(p)) for p in ports
+                if services_catalog.service_name(int(p))}
+    yield json.dumps({"note": NOTE, "port_count": len(ports), "services": services}) + "\n"
+    for sums, labels, ints in targets:
+        for start in range(0, len(sums), batch_size):
+            batch = (sums[start:start + batch_size] % 10).astype(np.uint8)
+            # same rule as simulate_scan: (ord sum + port) % 10 against the port's threshold
+            rand = (batch[:, None] + port_digits[None, :]) % 10
+            open_mask = rand < open_thresholds[None, :]
+            filtered_mask = rand >= 7
+            filtered_counts = filtered_mask.sum(axis=1)
+            closed_counts = len(ports) - open_mask.sum(axis=1) - filtered_counts
+            lines = []
+            for i in range(len(batch)):
+                label = labels[start + i] if labels is not None else _ipv4_label(int(ints[start + i]))
+                row = {"target": label, "open": ports[open_mask[i]].tolist()}
+                if include_filtered:
+                    row["filtered"] = ports[filtered_mask[i]].tolist()
+                else:
+                    row["filtered_count"] = int(filtered_counts[i])
+                if include_closed:
+                    row["closed"] = ports[~(open_mask[i] | filtered_mask[i])].tolist()
+                else:
+                    row["closed_count"] = int(closed_counts[i])
+                lines.append(json.dumps(row))
+            yield "\n".join(lines) + "\n"
+
+@router.post("/simulate-scan/bulk")
+def simulate_bulk_scan(body: BulkScanRequest):
+    """
+    Simulated sweep of many targets x many ports, streamed as NDJSON: a
+    header line (note, service names) then one line per target.
+    No network I/O is performed.
+    """
+    try:
+        ports = parse_ports(body.ports)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    targets = []
+    total = 0
+    for t in body.targets:
+        t = t.strip()
+        if not t:
+            continue
+        try:
+            size = ipaddress.ip_network(t, strict=False).num_addresses
+        except ValueError:
+            size = 1
+        total += size
+        if total > MAX_BULK_ADDRESSES:
+            raise HTTPException(status_code=400, detail=f"too many addresses (max {MAX_BULK_ADDRESSES})")
+        targets.append(t)
+
+    def expanded():
+        # expand lazily so only one network is materialised at a time
+        for t in targets:
+            yield _expand_target(t)
+
+    return StreamingResponse(_scan_rows(expanded(), ports, body.include_closed, body.include_filtered),
+                             media_type="application/x-ndjson")
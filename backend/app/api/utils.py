@@ -1,11 +1,145 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json, multiprocessing, os, re, tempfile
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from .. import log_analysis
+from ..core.metrics import timed
 
 router = APIRouter()
 
+CHUNK_SIZE = 1024 * 1024
+MAX_LINE = 64 * 1024   # lines longer than this are kept truncated (matching still sees all of it)
+TAIL_LINES = 500
+MAX_EXAMPLES = 10
+FAILED_PATTERNS = (b"FAILED LOGIN", b"AUTH FAIL")
+_OVERLAP = max(map(len, FAILED_PATTERNS)) - 1  # a pattern can straddle two pieces of a line
+
+def _has_failure(data: bytes) -> bool:
+    upper = data.upper()
+    return any(p in upper for p in FAILED_PATTERNS)
+
+async def _iter_lines(file: UploadFile):
+    """
+    Yield ``(line, failed)`` for each line of the upload while holding at most
+    one chunk in memory. ``line`` is cut to MAX_LINE bytes; ``failed`` is
+    matched over the whole line, piece by piece.
+    """
+    head = b""        # start of the current line, at most MAX_LINE bytes once it overflows
+    overflow = False  # the current line is longer than MAX_LINE
+    found = False     # a pattern was seen beyond MAX_LINE
+    window = b""      # last bytes already scanned
+
+    def feed(piece: bytes):
+        nonlocal head, overflow, found, window
+        if not overflow:
+            head += piece
+            if len(head) <= MAX_LINE:
+                return
+            found = _has_failure(head)
+            window = head[-_OVERLAP:]
+            head = head[:MAX_LINE]
+            overflow = True
+        else:
+            data = window + piece
+            found = found or _has_failure(data)
+            window = data[-_OVERLAP:]
+
+    def end():
+        nonlocal head, overflow, found, window
+        if overflow:
+            out = (head, found)
+        else:
+            line = head.rstrip(b"\r")
+            out = (line, _has_failure(line))
+        head, overflow, found, window = b"", False, False, b""
+        return out
+
+    pending = False  # the last chunk ended inside a line
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        pieces = chunk.split(b"\n")
+        for piece in pieces[:-1]:
+            feed(piece)
+            yield end()
+        feed(pieces[-1])
+        pending = bool(pieces[-1])
+    if pending:
+        yield end()
+
 @router.post("/parse-logs")
 async def parse_logs(file: UploadFile = File(...)):
-    # Lecture en local dans l'environnement contrôlé
-    content = (await file.read()).decode('utf-8', errors='ignore').splitlines()
-    failed = [line for line in content if "FAILED LOGIN" in line.upper() or "AUTH FAIL" in line.upper()]
-    recent = sorted(content[-500:])  # limiter la charge
-    return {"total_lines": len(content), "failed_attempts": len(failed), "examples": failed[:10], "recent_tail_count": len(recent)}
+    # Lecture en flux : la mémoire utilisée ne dépend pas de la taille du fichier
+    total = 0
+    failed = 0
+    examples = []
+    recent = deque(maxlen=TAIL_LINES)  # limiter la charge
+    with timed("parse_logs"):
+        async for line, is_failure in _iter_lines(file):
+            total += 1
+            recent.append(line)
+            if is_failure:
+                failed += 1
+                if len(examples) < MAX_EXAMPLES:
+                    examples.append(line.decode("utf-8", errors="ignore"))
+    return {"total_lines": total, "failed_attempts": failed, "examples": examples, "recent_tail_count": len(recent)}
+
+
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024  # below this, one worker is faster than forking
+ANALYSIS_WORKERS = os.cpu_count() or 1
+_pool = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # never fork the (multi-threaded) server process itself
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+def _parse_rules(raw: str | None):
+    if not raw:
+        return log_analysis.DEFAULT_RULES
+    try:
+        rules = tuple((r["name"], r["pattern"], bool(r.get("failure", True))) for r in json.loads(raw))
+        log_analysis.compile_rules(rules)
+    except (ValueError, TypeError, KeyError, re.error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid rules: {e}")
+    if not rules:
+        raise HTTPException(status_code=400, detail="Invalid rules: empty rule set")
+    return rules
+
+@router.post("/analyze-logs")
+async def analyze_logs(file: UploadFile = File(...), rules: str | None = Form(None),
+                       bucket: str = Form("hour"), top_k: int = Form(10)):
+    """
+    Multi-rule analysis of an auth/syslog capture.
+    ``rules`` is an optional JSON list of ``{"name", "pattern", "failure"}``;
+    the default set covers sshd, PAM and sudo failures.
+    """
+    if bucket not in log_analysis.BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {list(log_analysis.BUCKETS)}")
+    rule_set = _parse_rules(rules)
+    # the parallel workers need a real file they can seek into
+    with tempfile.NamedTemporaryFile(suffix=".log") as tmp:
+        while chunk := await file.read(CHUNK_SIZE):
+            await run_in_threadpool(tmp.write, chunk)
+        await run_in_threadpool(tmp.flush)
+        size = tmp.tell()
+        with timed("analyze_logs"):
+            if size >= PARALLEL_MIN_BYTES and ANALYSIS_WORKERS > 1:
+                result = await run_in_threadpool(
+                    log_analysis.analyze_file, tmp.name, rule_set, bucket, ANALYSIS_WORKERS, _get_pool())
+            else:
+                result = await run_in_threadpool(log_analysis.analyze_file, tmp.name, rule_set, bucket)
+    return log_analysis.summarize(result, top_k)
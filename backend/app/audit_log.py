@@ -0,0 +1,206 @@
+"""
+Écriture asynchrone du journal d'audit.
+
+Les appels à ``AuditWriter.write`` ne font que déposer la ligne dans une
+file bornée. Un thread d'arrière-plan regroupe les lignes et les écrit en
+un seul appel système dès que ``batch_size`` lignes sont prêtes ou que
+``flush_interval`` secondes se sont écoulées (fsync optionnel par lot).
+
+Quand le fichier dépasse ``rotate_bytes`` ou change de jour, il est renommé
+en ``audit-AAAAMMJJ-HHMMSS-NNN.log`` puis compressé en ``.gz`` si demandé
+(par blocs indexés, voir ``audit_query.compress_segment``).
+
+Plusieurs workers uvicorn peuvent écrire dans le même fichier : chaque lot
+est ajouté sous un verrou de fichier (``audit.log.lock``), qui couvre aussi
+la décision de rotation et le renommage. Avant chaque lot, le writer compare
+l'inode du chemin à celui de son descripteur et rouvre le fichier si un
+autre processus l'a fait tourner. La taille est lue par ``fstat`` : elle
+compte les lignes de tous les processus. La compression se fait après avoir
+rendu le verrou.
+
+Si la file est pleine, la politique ``backpressure`` s'applique :
+``"drop"`` abandonne la ligne immédiatement, ``"block"`` attend au plus
+``block_timeout`` secondes avant de l'abandonner. Les lignes abandonnées
+sont comptées dans ``stats()``.
+"""
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from .audit_query import compress_segment
+from .core.filelock import file_lock
+from .core.metrics import timed
+
+_STOP = object()
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        path: str,
+        queue_size: int = 10000,
+        backpressure: str = "drop",
+        block_timeout: float = 0.05,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        fsync: bool = False,
+        rotate_bytes: int = 50 * 1024 * 1024,
+        rotate_daily: bool = True,
+        compress: bool = True,
+    ):
+        if backpressure not in ("drop", "block"):
+            raise ValueError(f"Politique de backpressure inconnue : {backpressure}")
+        self.path = os.path.abspath(path)
+        self.lock_file = self.path + ".lock"
+        self.backpressure = backpressure
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._ino: Optional[int] = None
+        self._day = None
+        self._lock = threading.Lock()  # compteurs (producteurs et thread d'écriture)
+        self._counters = {"written": 0, "dropped": 0, "batches": 0, "rotations": 0}
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    # --- Côté producteurs ---
+
+    def write(self, line: str) -> bool:
+        """Dépose une ligne (terminée par ``\\n``). Retourne False si elle est abandonnée."""
+        try:
+            if self.backpressure == "block":
+                self._queue.put(line, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Attend que toutes les lignes déjà déposées soient écrites. Retourne
+        False si ce n'est pas fait en ``timeout`` secondes (file pleine comprise).
+        """
+        deadline = time.monotonic() + timeout
+        marker = _Flush()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(max(0.0, deadline - time.monotonic()))
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, queued=self._queue.qsize())
+
+    # --- Thread d'écriture ---
+
+    def _run(self):
+        batch: List[str] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._write(batch)
+                if self._file:
+                    self._file.close()
+                return
+            if isinstance(item, _Flush):
+                self._write(batch)
+                batch = []
+                item.done.set()
+                continue
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            self._write(batch)
+            batch = []
+
+    def _open(self):
+        self._file = open(self.path, "ab")
+        st = os.fstat(self._file.fileno())
+        self._ino = st.st_ino
+        self._day = time.localtime(st.st_mtime if st.st_size else time.time())[:3]
+
+    def _reopen_if_rotated(self):
+        """Rouvre le fichier actif s'il a été renommé (rotation par un autre processus). Verrou tenu."""
+        if self._file is not None:
+            try:
+                if os.stat(self.path).st_ino == self._ino:
+                    return
+            except FileNotFoundError:
+                pass
+            self._file.close()
+        self._open()
+
+    def _write(self, batch: List[str]):
+        if not batch:
+            return
+        with timed("audit_write"):
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[str]):
+        data = "".join(batch).encode("utf-8")
+        segment = None
+        with file_lock(self.lock_file):
+            self._reopen_if_rotated()
+            size = os.fstat(self._file.fileno()).st_size
+            if size and (
+                size + len(data) > self.rotate_bytes
+                or (self.rotate_daily and time.localtime()[:3] != self._day)
+            ):
+                segment = self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        with self._lock:
+            self._counters["written"] += len(batch)
+            self._counters["batches"] += 1
+            if segment is not None:
+                self._counters["rotations"] += 1
+        if segment is not None and self.compress:
+            compress_segment(segment)
+
+    def _rotate(self) -> str:
+        """Renomme le fichier actif et en ouvre un nouveau ; renvoie le segment. Verrou tenu."""
+        self._file.close()
+        base, ext = os.path.splitext(self.path)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        n = 0
+        while True:
+            # le suffixe garde les noms triables si plusieurs rotations tombent dans la même seconde
+            segment = f"{base}-{stamp}-{n:03d}{ext}"
+            if not (os.path.exists(segment) or os.path.exists(segment + ".gz")):
+                break
+            n += 1
+        os.replace(self.path, segment)
+        self._open()
+        return segment
+
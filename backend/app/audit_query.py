@@ -0,0 +1,322 @@
+"""
+Lecture du journal d'audit (segment actif + segments tournés).
+
+Chaque ligne commence par un horodatage ``AAAA-MM-JJ HH:MM:SS`` de longueur
+fixe, et les lignes d'un segment sont dans l'ordre d'écriture : on peut donc
+comparer les horodatages en octets et faire une recherche dichotomique.
+
+L'ordre n'est pas strict : plusieurs workers ajoutent leurs lots au même
+fichier, et un lot peut contenir des lignes un peu plus anciennes que celles
+du lot précédent (délai de la file d'écriture). Une requête élargit donc ses
+bornes de ``skew`` secondes pour choisir segments et point de départ, et ne
+s'arrête qu'après avoir dépassé ``fin + skew`` ; une ligne plus en retard
+que ``skew`` peut être manquée.
+
+- La plage horaire d'un segment tourné se déduit de son nom
+  (``audit-AAAAMMJJ-HHMMSS-NNN.log[.gz]`` = heure de rotation) : les
+  segments hors plage ne sont jamais ouverts.
+- Une rotation renomme le fichier actif sans changer son inode : l'index
+  clairsemé et les curseurs sont rattachés à l'inode, pas au nom.
+- Pour les segments non compressés, un index clairsemé (un horodatage tous
+  les ``stride`` octets) est construit une fois via ``mmap`` ; la requête
+  saute directement à la bonne zone du fichier.
+- Les segments ``.gz`` sont écrits par ``compress_segment`` en membres gzip
+  indépendants d'environ ``GZIP_BLOCK`` octets, avec un index à côté
+  (``.gz.idx`` : premier horodatage, offset décompressé et offset compressé
+  de chaque bloc, inode du segment d'origine). La lecture reprend au bloc
+  voulu ; les offsets décompressés et l'inode d'origine étant conservés, un
+  curseur émis avant la compression reste valable. Sans index (ancien
+  segment), le fichier est lu en flux depuis le début.
+"""
+import base64
+import bisect
+import glob
+import gzip
+import json
+import mmap
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+TS_LEN = 19  # len("2026-01-01 00:00:00")
+GZIP_BLOCK = 1 << 20  # octets décompressés par membre gzip
+_MIN_TS = "0000-00-00 00:00:00"
+_MAX_TS = "9999-99-99 99:99:99"
+_SEGMENT_RE = re.compile(r"-(\d{4})(\d{2})(\d{2})-(\d{2})(\d{2})(\d{2})-\d+\.log(\.gz)?$")
+_USER_RE = re.compile(r"\buser=(\S*)")
+_ACTION_RE = re.compile(r"\baction=(\S*)")
+
+
+def normalize_ts(value: Optional[str], upper: bool = False) -> bytes:
+    """Complète un horodatage partiel (``2026-10-18``, ``2026-10-18T10``...)."""
+    if not value:
+        return (_MAX_TS if upper else _MIN_TS).encode()
+    value = value.replace("T", " ")[:TS_LEN]
+    pad = _MAX_TS if upper else _MIN_TS
+    return (value + pad[len(value):]).encode()
+
+
+def parse_line(line: str) -> dict:
+    message = line[TS_LEN + 1:]
+    user = _USER_RE.search(message)
+    action = _ACTION_RE.search(message)
+    return {
+        "ts": line[:TS_LEN],
+        "user": user.group(1) if user else None,
+        "action": action.group(1) if action else message.split(" ", 1)[0],
+        "message": message,
+    }
+
+
+def encode_cursor(inode: int, offset: int, ts: str) -> str:
+    raw = json.dumps({"i": inode, "o": offset, "t": ts}).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int, str]:
+    """``(inode du segment, offset, horodatage)`` ; ``ValueError`` si le curseur est invalide."""
+    c = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(c, dict):
+        raise ValueError("cursor must be an object")
+    inode, offset, ts = c.get("i"), c.get("o"), c.get("t")
+    if type(inode) is not int or type(offset) is not int or offset < 0 or not isinstance(ts, str):
+        raise ValueError("malformed cursor")
+    return inode, offset, ts
+
+
+def shift_ts(ts: bytes, seconds: float) -> bytes:
+    """Décale un horodatage ; les bornes ouvertes (``0000-...``, ``9999-...``) restent telles quelles."""
+    try:
+        t = time.mktime(time.strptime(ts.decode(), "%Y-%m-%d %H:%M:%S"))
+    except ValueError:
+        return ts
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t + seconds)).encode()
+
+
+def compress_segment(segment: str, block: int = GZIP_BLOCK):
+    """
+    Compresse un segment tourné en ``segment.gz`` (membres gzip de ``block``
+    octets, coupés en fin de ligne) et écrit son index ``segment.gz.idx``.
+    L'index est en place avant le ``.gz``, et le segment d'origine n'est
+    supprimé qu'une fois le ``.gz`` renommé.
+    """
+    source_inode = os.stat(segment).st_ino
+    tmp = f"{segment}.gz.{os.getpid()}.tmp"
+    blocks = []
+    raw = 0
+    with open(segment, "rb") as src, open(tmp, "wb") as dst:
+        while True:
+            chunk = src.read(block)
+            if not chunk:
+                break
+            if not chunk.endswith(b"\n"):
+                chunk += src.readline()
+            blocks.append([chunk[:TS_LEN].decode("ascii", errors="replace"), raw, dst.tell()])
+            dst.write(gzip.compress(chunk))
+            raw += len(chunk)
+        dst.flush()
+    index_tmp = f"{segment}.gz.idx.{os.getpid()}.tmp"
+    with open(index_tmp, "w", encoding="utf-8") as f:
+        json.dump({"source_inode": source_inode, "blocks": blocks}, f)
+    os.replace(index_tmp, segment + ".gz.idx")
+    os.replace(tmp, segment + ".gz")
+    os.remove(segment)
+
+
+def _inode(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+class AuditIndex:
+    def __init__(self, active_path: str, stride: int = 1 << 20, skew: float = 5.0):
+        self.active_path = os.path.abspath(active_path)
+        self.stride = stride
+        self.skew = skew
+        self._lock = threading.Lock()
+        # chemin -> (inode, taille indexée, [horodatages], [offsets])
+        self._sparse: Dict[str, Tuple[int, int, List[bytes], List[int]]] = {}
+        # chemin .gz -> (inode du .gz, inode d'origine, [horodatages], [offsets décompressés], [offsets compressés])
+        self._gz: Dict[str, Tuple[int, int, List[bytes], List[int], List[int]]] = {}
+
+    # --- Segments ---
+
+    def segments(self) -> List[Tuple[str, bytes, bytes]]:
+        """Liste ordonnée de (chemin, borne basse, borne haute) des segments."""
+        base, ext = os.path.splitext(self.active_path)
+        rotated = []
+        plain = set(glob.glob(f"{glob.escape(base)}-*{ext}"))
+        for path in plain | set(glob.glob(f"{glob.escape(base)}-*{ext}.gz")):
+            m = _SEGMENT_RE.search(path)
+            if m and not (path.endswith(".gz") and path[:-3] in plain):
+                # pendant la compression, seul le segment d'origine est lu
+                y, mo, d, h, mi, s = m.groups()[:6]
+                rotated.append((f"{y}-{mo}-{d} {h}:{mi}:{s}".encode(), path))
+        rotated.sort()
+        out = []
+        lower = _MIN_TS.encode()
+        for upper, path in rotated:
+            out.append((path, lower, upper))
+            lower = upper
+        if os.path.exists(self.active_path):
+            out.append((self.active_path, lower, _MAX_TS.encode()))
+        return out
+
+    # --- Index clairsemé (segments non compressés) ---
+
+    def _sparse_index(self, path: str, inode: int, mm: mmap.mmap) -> Tuple[List[bytes], List[int]]:
+        size = len(mm)
+        with self._lock:
+            known, indexed, stamps, offsets = self._sparse.get(path, (inode, 0, [], []))
+            if known != inode or indexed > size:
+                # le fichier actif a été remplacé après une rotation
+                indexed, stamps, offsets = 0, [], []
+            pos = offsets[-1] + self.stride if offsets else 0
+            while pos < size:
+                if pos:
+                    nl = mm.find(b"\n", pos)
+                    if nl < 0 or nl + 1 >= size:
+                        break
+                    pos = nl + 1
+                stamps.append(mm[pos:pos + TS_LEN])
+                offsets.append(pos)
+                pos += self.stride
+            self._sparse[path] = (inode, size, stamps, offsets)
+            return stamps, offsets
+
+    def _scan_mmap(self, f, path: str, start: bytes, offset: Optional[int]) -> Iterator[Tuple[int, bytes]]:
+        with f:
+            st = os.fstat(f.fileno())
+            if st.st_size == 0:
+                return
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with mm:
+            if offset is None:
+                stamps, offsets = self._sparse_index(path, st.st_ino, mm)
+                i = bisect.bisect_left(stamps, start) - 1
+                offset = offsets[i] if i >= 0 else 0
+            size = len(mm)
+            while offset < size:
+                nl = mm.find(b"\n", offset)
+                if nl < 0:
+                    # ligne en cours d'écriture
+                    return
+                yield offset, mm[offset:nl]
+                offset = nl + 1
+
+    # --- Segments compressés ---
+
+    def _gzip_index(self, path: str) -> Optional[Tuple[int, List[bytes], List[int], List[int]]]:
+        """``(inode d'origine, horodatages, offsets décompressés, offsets compressés)`` du ``.gz``, ou None."""
+        inode = _inode(path)
+        with self._lock:
+            cached = self._gz.get(path)
+            if cached is not None and cached[0] == inode:
+                return cached[1:]
+        try:
+            with open(path + ".idx", "r", encoding="utf-8") as f:
+                idx = json.load(f)
+        except (OSError, ValueError):
+            return None
+        blocks = idx["blocks"]
+        entry = (inode, idx["source_inode"], [b[0].encode() for b in blocks],
+                 [b[1] for b in blocks], [b[2] for b in blocks])
+        with self._lock:
+            self._gz[path] = entry
+        return entry[1:]
+
+    def _segment_id(self, path: str) -> Optional[int]:
+        """Identifiant des curseurs : l'inode, celui d'avant compression pour un ``.gz`` indexé."""
+        if path.endswith(".gz"):
+            idx = self._gzip_index(path)
+            if idx is not None:
+                return idx[0]
+        return _inode(path)
+
+    def _scan_gzip(self, path: str, start: bytes, offset: Optional[int]) -> Iterator[Tuple[int, bytes]]:
+        pos, seek = 0, 0
+        idx = self._gzip_index(path)
+        if idx is not None:
+            _, stamps, raw_offsets, gz_offsets = idx
+            if offset is not None:
+                i = bisect.bisect_right(raw_offsets, offset) - 1
+            else:
+                i = bisect.bisect_left(stamps, start) - 1
+            if i >= 0:
+                pos, seek = raw_offsets[i], gz_offsets[i]
+        with open(path, "rb") as raw:
+            raw.seek(seek)
+            with gzip.GzipFile(fileobj=raw, mode="rb") as f:
+                for line in f:
+                    if offset is None or pos >= offset:
+                        yield pos, line.rstrip(b"\n")
+                    pos += len(line)
+
+    def _scan(self, path: str, start: bytes, offset: Optional[int]) -> Iterator[Tuple[int, bytes]]:
+        if path.endswith(".gz"):
+            return self._scan_gzip(path, start, offset)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            if path == self.active_path:
+                return iter(())
+            # compressé entre le listage et l'ouverture : mêmes offsets dans le .gz
+            return self._scan_gzip(path + ".gz", start, offset)
+        return self._scan_mmap(f, path, start, offset)
+
+    # --- Requête ---
+
+    def query(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        user: Optional[str] = None,
+        action: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        lo = normalize_ts(start)
+        hi = normalize_ts(end, upper=True)
+        resume_segment, resume_offset = None, None
+        if cursor:
+            resume_segment, resume_offset, resume_ts = decode_cursor(cursor)
+        segments = self.segments()
+        inodes = [self._segment_id(path) for path, _, _ in segments]
+        if resume_segment is not None and resume_segment not in inodes:
+            # segment supprimé depuis : on repart de l'horodatage du curseur
+            lo = max(lo, resume_ts.encode())
+            resume_segment, resume_offset = None, None
+        # bornes élargies : lignes écrites en retard par un autre worker
+        scan_lo, scan_hi = shift_ts(lo, -self.skew), shift_ts(hi, self.skew)
+
+        items: List[dict] = []
+        started = resume_segment is None
+        for (path, seg_lo, seg_hi), inode in zip(segments, inodes):
+            if not started:
+                if inode != resume_segment:
+                    continue
+                started = True
+                offset = resume_offset
+            else:
+                offset = None
+            if seg_hi < scan_lo or seg_lo > scan_hi:
+                continue
+            for pos, raw in self._scan(path, scan_lo, offset):
+                ts = raw[:TS_LEN]
+                if ts > scan_hi:
+                    break
+                if ts < lo or ts > hi:
+                    continue
+                rec = parse_line(raw.decode("utf-8", errors="replace"))
+                if user is not None and rec["user"] != user:
+                    continue
+                if action is not None and rec["action"] != action:
+                    continue
+                if len(items) == limit:
+                    return items, encode_cursor(inode, pos, rec["ts"])
+                items.append(rec)
+        return items, None
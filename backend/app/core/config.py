@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 # ATTENTION : La ligne qui causait le problème (Importation Circulaire) était
 # probablement ici, essayant d'importer 'settings' depuis ce même module. 
@@ -26,6 +26,90 @@ class Settings(BaseSettings):
     POSTGRES_SERVER: str = "db"
     POSTGRES_PORT: str = "5432"
     POSTGRES_DB: str = "kali_db"
+
+    # Stockage des utilisateurs : "sqlite" (fichier app/db.sqlite3 par défaut) ou "postgres"
+    DATABASE_BACKEND: str = "sqlite"
+    SQLITE_PATH: Optional[str] = None
+    DB_POOL_SIZE: int = 5
+
+    @property
+    def POSTGRES_DSN(self) -> str:
+        return (f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+                f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}")
+
+    # Répertoire des données applicatives (store CTF, journal d'audit).
+    # Défaut : app/data pour le store et app/audit.log pour l'audit.
+    DATA_DIR: Optional[str] = None
+
+    # Hachage des mots de passe (bcrypt, exécuté hors de la boucle asyncio)
+    BCRYPT_ROUNDS: int = 12                # coût ; les hachages plus faibles sont refaits à la connexion
+    PASSWORD_HASH_WORKERS: int = 4         # threads dédiés au hachage
+    PASSWORD_HASH_MAX_PENDING: int = 64    # au-delà, les requêtes sont refusées (503)
+
+    # Cache des jetons JWT déjà vérifiés (nombre d'entrées, LRU)
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Administrateurs CTF (export des empreintes de flags, import en mode "replace").
+    # Variable d'environnement au format JSON : ADMIN_USERS='["prof"]'
+    ADMIN_USERS: List[str] = []
+
+    # Store CTF et registre des résolutions partagés entre workers : délai max (s)
+    # avant qu'une lecture voie les écritures d'un autre processus
+    CTF_SYNC_INTERVAL: float = 0.05
+
+    # Déploiement des labs (docker-compose exécuté en tâche de fond)
+    LAB_COMPOSE_COMMAND: str = "docker-compose"   # remplaçable par un faux exécutable pour les tests
+    LAB_DIR: Optional[str] = None                 # défaut : ../labs depuis le répertoire courant
+    LAB_MAX_CONCURRENT: int = 2                   # déploiements simultanés
+    LAB_QUEUE_SIZE: int = 100                     # déploiements en attente max (429 au-delà)
+    LAB_WARM_POOL_SIZE: int = 0                   # instances pré-démarrées (0 = désactivé)
+    LAB_WARM_POOL_LAB: str = "vulnerable-web"
+    LAB_LOG_TAIL_LINES: int = 200
+    LAB_WARM_PORT_BASE: int = 18080               # ports hôtes des instances du pool (LAB_HTTP_PORT)
+    LAB_WARM_PORTS_PER_WORKER: int = 100         # tranche de ports de chaque worker à partir de cette base
+    LAB_INSTANCE_TTL: float = 7200.0              # durée de vie d'une instance remise (secondes)
+    LAB_WARM_RETRY_DELAY: float = 5.0             # délai avant de relancer un démarrage échoué (doublé à chaque échec)
+    LAB_WARM_RETRY_MAX_DELAY: float = 300.0
+
+    # Limitation de débit (connexion, soumission de flags), par IP et par utilisateur
+    RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_PER_SECOND: float = 0.5     # recharge du seau de jetons (par utilisateur)
+    LOGIN_BURST: int = 10                  # rafale autorisée
+    LOGIN_IP_RATE_PER_SECOND: float = 5.0  # par IP : une classe entière peut partager une IP (NAT)
+    LOGIN_IP_BURST: int = 100
+    FLAG_RATE_PER_SECOND: float = 2.0
+    FLAG_BURST: int = 30
+    FLAG_IP_RATE_PER_SECOND: float = 20.0
+    FLAG_IP_BURST: int = 300
+    RATE_LIMIT_FREE_FAILURES: int = 5      # échecs consécutifs tolérés avant freinage (par IP + utilisateur)
+    RATE_LIMIT_FAILURE_BASE_DELAY: float = 1.0   # puis 1 s, 2 s, 4 s...
+    RATE_LIMIT_FAILURE_MAX_DELAY: float = 60.0
+    RATE_LIMIT_FAILURE_WINDOW: float = 900.0     # échecs oubliés après ce délai (s)
+    RATE_LIMIT_SHARDS: int = 16
+    RATE_LIMIT_MAX_ENTRIES: int = 100000
+    RATE_LIMIT_IDLE_SECONDS: float = 600.0       # entrées inactives évincées
+    RATE_LIMIT_TRUST_PROXY: bool = False   # utiliser X-Forwarded-For (derrière un reverse proxy)
+
+    # Métriques /metrics additionnées sur tous les workers : répertoire partagé,
+    # à vider avant chaque démarrage (même variable que prometheus_client)
+    PROMETHEUS_MULTIPROC_DIR: Optional[str] = None
+
+    # Compression des réponses (gzip, ou brotli si le paquet est installé)
+    COMPRESSION_MIN_SIZE: int = 1024       # en dessous, la réponse part telle quelle
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 5
+
+    # Journal d'audit (écriture asynchrone par lots)
+    AUDIT_QUEUE_SIZE: int = 10000          # taille max de la file en mémoire
+    AUDIT_BACKPRESSURE: str = "drop"       # "drop" ou "block" quand la file est pleine
+    AUDIT_BLOCK_TIMEOUT: float = 0.05      # attente max (s) en mode "block" avant abandon
+    AUDIT_BATCH_SIZE: int = 500            # écriture dès que ce nombre de lignes est atteint
+    AUDIT_FLUSH_INTERVAL: float = 0.5      # ... ou après ce délai (s)
+    AUDIT_FSYNC: bool = False              # fsync après chaque lot (group commit)
+    AUDIT_ROTATE_BYTES: int = 50 * 1024 * 1024
+    AUDIT_ROTATE_DAILY: bool = True
+    AUDIT_COMPRESS: bool = True            # gzip des segments après rotation
+    AUDIT_QUERY_SKEW: float = 5.0          # désordre max (s) entre lignes de workers différents
     
     # Définition de la source des variables d'environnement
     class Config:
@@ -0,0 +1,42 @@
+"""
+Verrou exclusif entre processus (``flock``), pour les fichiers partagés par
+plusieurs workers uvicorn (store CTF, registre des résolutions, audit).
+
+``flock`` n'est pas réentrant pour un même processus : un appelant qui tient
+déjà le verrou ne doit pas le reprendre.
+"""
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows : un seul processus supposé
+    fcntl = None
+
+
+@contextlib.contextmanager
+def file_lock(path: str):
+    """Verrou exclusif sur ``path`` (créé si besoin) pendant le bloc."""
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def try_lock(path: str):
+    """
+    Prend le verrou sans attendre. Renvoie le fichier ouvert, à garder
+    ouvert tant que le verrou doit tenir (le fermer le libère), ou None s'il
+    est déjà pris par un autre processus ou descripteur.
+    """
+    f = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+    return f
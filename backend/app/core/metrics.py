@@ -0,0 +1,250 @@
+"""
+Métriques au format texte Prometheus, sans dépendance externe.
+
+- ``MetricsMiddleware`` (ASGI pur) mesure chaque requête HTTP : histogramme
+  de latence, requêtes en cours et compteur par code de statut, étiquetés
+  par le gabarit de route (``/api/v1/labs/jobs/{job_id}``) pour garder une
+  cardinalité bornée.
+- ``timed("nom")`` mesure une section interne (bcrypt, store CTF, audit,
+  analyse de logs) dans ``kali_internal_duration_seconds``.
+- ``registry.render()`` produit le texte exposé par ``/metrics``.
+
+Les valeurs vivent dans la mémoire de chaque processus. Avec plusieurs
+workers uvicorn, définir ``PROMETHEUS_MULTIPROC_DIR`` (même convention que
+``prometheus_client``) : chaque worker y écrit ses valeurs (``<pid>.json``)
+toutes les ``dump_interval`` secondes, et ``/metrics`` additionne les
+fichiers de tous les workers, quel que soit celui qui répond. Les compteurs
+et histogrammes d'un worker arrêté restent comptés ; ses jauges sont
+ignorées dès que son fichier n'est plus rafraîchi. Le répertoire doit être
+vidé avant chaque démarrage du serveur.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join('%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(a: float, b: float) -> float:
+        return a + b
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        items = sorted((self.snapshot() if values is None else values).items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # étiquettes -> [compteurs par tranche (+Inf en dernier), somme, nombre]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {k: [[*v[0]], v[1], v[2]] for k, v in self._values.items()}
+
+    @staticmethod
+    def merge(a: list, b: list) -> list:
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], list]] = None) -> List[str]:
+        items = sorted((self.snapshot() if values is None else values).items())
+        lines = self._header()
+        names = self.labelnames + ("le",)
+        for labels, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self, multiproc_dir: Optional[str] = None, dump_interval: float = 1.0):
+        self._metrics: List[_Metric] = []
+        self.multiproc_dir = multiproc_dir
+        self.dump_interval = dump_interval
+        self._dumper: Optional[threading.Thread] = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        merged = self._collect() if self.multiproc_dir else {}
+        for metric in self._metrics:
+            lines.extend(metric.render(merged.get(metric.name)) if merged else metric.render())
+        return "\n".join(lines) + "\n"
+
+    # --- Mode multi-processus ---
+
+    def start_dumping(self):
+        """Démarre l'écriture périodique des valeurs de ce processus (une fois par processus)."""
+        if self.multiproc_dir and self._dumper is None:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            self._dumper = threading.Thread(target=self._dump_loop, name="metrics-dump", daemon=True)
+            self._dumper.start()
+
+    def _dump_loop(self):
+        while True:
+            self.dump()
+            time.sleep(self.dump_interval)
+
+    def dump(self):
+        data = {m.name: [[list(k), v] for k, v in m.snapshot().items()] for m in self._metrics}
+        path = os.path.join(self.multiproc_dir, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _collect(self) -> Dict[str, dict]:
+        """Valeurs additionnées de tous les workers ; celles de ce processus sont lues en mémoire."""
+        merged = {m.name: m.snapshot() for m in self._metrics}
+        by_name = {m.name: m for m in self._metrics}
+        stale = time.time() - 3 * self.dump_interval
+        for path in glob.glob(os.path.join(glob.escape(self.multiproc_dir), "*.json")):
+            if os.path.basename(path) == f"{os.getpid()}.json":
+                continue
+            try:
+                fresh = os.path.getmtime(path) >= stale
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, items in data.items():
+                metric = by_name.get(name)
+                if metric is None or (metric.kind == "gauge" and not fresh):
+                    continue
+                values = merged[name]
+                for labels, value in items:
+                    key = tuple(labels)
+                    values[key] = metric.merge(values[key], value) if key in values else value
+        return merged
+
+
+registry = Registry(settings.PROMETHEUS_MULTIPROC_DIR)
+
+http_requests = registry.register(Counter(
+    "kali_http_requests_total", "Requêtes HTTP traitées.", ("method", "route", "status")))
+http_latency = registry.register(Histogram(
+    "kali_http_request_duration_seconds", "Latence des requêtes HTTP.", ("method", "route")))
+http_in_flight = registry.register(Gauge(
+    "kali_http_requests_in_flight", "Requêtes HTTP en cours.", ("method",)))
+internal_latency = registry.register(Histogram(
+    "kali_internal_duration_seconds", "Durée des sections internes coûteuses.", ("op",)))
+
+
+@contextmanager
+def timed(op: str):
+    """Mesure la durée du bloc dans ``kali_internal_duration_seconds{op=...}``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        internal_latency.observe(time.perf_counter() - start, op)
+
+
+def _route_template(scope) -> str:
+    """Gabarit de la route trouvée par le routeur, préfixe d'inclusion compris."""
+    # les versions récentes de FastAPI gardent la route d'origine (sans
+    # préfixe) dans scope["route"] et le chemin complet dans un contexte à part
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec(method)
+            route = _route_template(scope)
+            http_latency.observe(elapsed, method, route)
+            http_requests.inc(method, route, status)
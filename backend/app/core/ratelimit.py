@@ -0,0 +1,236 @@
+"""
+Limitation de débit en mémoire (seaux à jetons) et freinage des échecs répétés.
+
+- Chaque clé (``ip:…``, ``user:…``) a un seau de ``burst`` jetons rechargé
+  à ``rate`` jetons par seconde ; une requête consomme un jeton. Les clés
+  ``ip:`` ont leurs propres valeurs (``ip_rate``, ``ip_burst``), plus larges :
+  une salle de classe entière peut partager une IP (NAT).
+- Une requête n'est comptée que si toutes ses clés l'acceptent : ``hit``
+  vérifie chaque clé sous les verrous des shards concernés avant de
+  consommer quoi que ce soit.
+- Les échecs (mot de passe, flag) sont comptés par couple (IP, utilisateur)
+  (clés ``ip-user:``, ``failure_keys_for``), jamais par IP ni par
+  utilisateur seuls : sinon n'importe qui pourrait bloquer une IP partagée
+  ou le compte d'un autre. ``failure`` ignore les autres clés, et les clés
+  ``ip-user:`` n'ont pas de seau de jetons. Après ``free_failures`` échecs
+  consécutifs, la clé doit attendre ``base_delay * 2^(n - free_failures)``
+  secondes (plafonné à ``max_delay``) avant l'essai suivant. Un succès remet
+  le compteur à zéro ; des échecs plus vieux que ``failure_window`` sont oubliés.
+- Les entrées sont réparties en ``shards`` dictionnaires ordonnés (LRU),
+  chacun avec son verrou : les entrées inactives depuis ``idle_seconds``
+  sont évincées par le début, et la taille totale est bornée.
+- Un refus lève ``RateLimited`` avec le délai à indiquer dans ``Retry-After``.
+"""
+import contextlib
+import math
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from .config import settings
+from .metrics import Counter, registry
+
+rate_limited = registry.register(Counter(
+    "kali_rate_limited_total", "Requêtes refusées par la limitation de débit.", ("scope", "reason")))
+
+FAILURE_PREFIX = "ip-user:"
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Entry:
+    __slots__ = ("tokens", "updated", "failures", "last_failure", "blocked_until")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.failures = 0
+        self.last_failure = 0.0
+        self.blocked_until = 0.0
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+
+class RateLimiter:
+    def __init__(self, name: str, rate: float, burst: int, shards: int = 16, max_entries: int = 100000,
+                 idle_seconds: float = 600.0, free_failures: int = 5, base_delay: float = 1.0,
+                 max_delay: float = 60.0, failure_window: float = 900.0,
+                 ip_rate: Optional[float] = None, ip_burst: Optional[int] = None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.ip_rate = rate if ip_rate is None else ip_rate
+        self.ip_burst = burst if ip_burst is None else ip_burst
+        self.max_per_shard = max(1, max_entries // shards)
+        self.idle_seconds = idle_seconds
+        self.free_failures = free_failures
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_window = failure_window
+        self._shards: List[_Shard] = [_Shard() for _ in range(shards)]
+        self.evictions = 0
+
+    def _shard_index(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % len(self._shards)
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[self._shard_index(key)]
+
+    def _limits(self, key: str) -> Tuple[float, int]:
+        return (self.ip_rate, self.ip_burst) if key.startswith("ip:") else (self.rate, self.burst)
+
+    def _entry(self, shard: _Shard, key: str, now: float) -> _Entry:
+        """Entrée de ``key`` (créée au besoin), marquée comme la plus récente. Verrou du shard tenu."""
+        entries = shard.entries
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = _Entry(float(self._limits(key)[1]), now)
+        else:
+            entries.move_to_end(key)
+        # éviction par le début : les moins récemment utilisées
+        while len(entries) > 1:
+            oldest_key, oldest = next(iter(entries.items()))
+            if len(entries) <= self.max_per_shard and now - oldest.updated < self.idle_seconds:
+                break
+            if oldest_key == key:
+                break
+            del entries[oldest_key]
+            self.evictions += 1
+        return entry
+
+    # --- API ---
+
+    def hit(self, *keys: str):
+        """
+        Consomme un jeton pour chaque clé, ou aucun : lève ``RateLimited`` si
+        l'une est épuisée ou freinée (clés ``ip-user:``).
+        """
+        now = time.monotonic()
+        with contextlib.ExitStack() as stack:
+            # verrous pris dans l'ordre des shards : pas d'interblocage entre requêtes
+            for i in sorted({self._shard_index(key) for key in keys}):
+                stack.enter_context(self._shards[i].lock)
+            refilled = []
+            for key in keys:
+                entry = self._entry(self._shard(key), key, now)
+                if key.startswith(FAILURE_PREFIX):
+                    if entry.blocked_until > now:
+                        raise RateLimited(entry.blocked_until - now, "failures")
+                    continue
+                rate, burst = self._limits(key)
+                tokens = min(burst, entry.tokens + (now - entry.updated) * rate)
+                if tokens < 1:
+                    raise RateLimited((1 - tokens) / rate, "rate")
+                refilled.append((entry, tokens))
+            for entry, tokens in refilled:
+                entry.tokens = tokens - 1
+                entry.updated = now
+
+    def failure(self, *keys: str):
+        """Échec (mot de passe, flag) : allonge le délai imposé avant l'essai suivant (clés ``ip-user:`` seulement)."""
+        now = time.monotonic()
+        for key in keys:
+            if not key.startswith(FAILURE_PREFIX):
+                continue
+            shard = self._shard(key)
+            with shard.lock:
+                entry = self._entry(shard, key, now)
+                if now - entry.last_failure > self.failure_window:
+                    entry.failures = 0
+                entry.failures += 1
+                entry.last_failure = now
+                excess = entry.failures - self.free_failures
+                if excess >= 0:
+                    entry.blocked_until = now + min(self.max_delay, self.base_delay * 2 ** excess)
+
+    def success(self, *keys: str):
+        for key in keys:
+            shard = self._shard(key)
+            with shard.lock:
+                entry = shard.entries.get(key)
+                if entry is not None:
+                    entry.failures = 0
+                    entry.blocked_until = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": sum(len(s.entries) for s in self._shards),
+            "shards": len(self._shards),
+            "evictions": self.evictions,
+            "rate": self.rate,
+            "burst": self.burst,
+            "ip_rate": self.ip_rate,
+            "ip_burst": self.ip_burst,
+        }
+
+    # --- Intégration FastAPI ---
+
+    def check(self, *keys: str):
+        """Comme ``hit`` mais répond 429 avec ``Retry-After``."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        try:
+            self.hit(*keys)
+        except RateLimited as e:
+            rate_limited.inc(self.name, e.reason)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Trop de tentatives, réessayez plus tard.",
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+
+
+def client_ip(request: Request) -> str:
+    """IP du client ; derrière un proxy de confiance, la première de ``X-Forwarded-For``."""
+    if settings.RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def keys_for(request: Request, user: str | None) -> List[str]:
+    """Clés des seaux de jetons (débit brut)."""
+    keys = [f"ip:{client_ip(request)}"]
+    if user:
+        keys.append(f"user:{user}")
+    return keys
+
+
+def failure_keys_for(request: Request, user: str | None) -> List[str]:
+    """Clé du freinage des échecs : le couple (IP, utilisateur), pour ne pas bloquer toute une IP partagée."""
+    return [f"{FAILURE_PREFIX}{client_ip(request)}|{user}"] if user else []
+
+
+def _limiter(name: str, rate: float, burst: int, ip_rate: float, ip_burst: int) -> RateLimiter:
+    return RateLimiter(
+        name, rate, burst,
+        ip_rate=ip_rate,
+        ip_burst=ip_burst,
+        shards=settings.RATE_LIMIT_SHARDS,
+        max_entries=settings.RATE_LIMIT_MAX_ENTRIES,
+        idle_seconds=settings.RATE_LIMIT_IDLE_SECONDS,
+        free_failures=settings.RATE_LIMIT_FREE_FAILURES,
+        base_delay=settings.RATE_LIMIT_FAILURE_BASE_DELAY,
+        max_delay=settings.RATE_LIMIT_FAILURE_MAX_DELAY,
+        failure_window=settings.RATE_LIMIT_FAILURE_WINDOW,
+    )
+
+
+login_limiter = _limiter("login", settings.LOGIN_RATE_PER_SECOND, settings.LOGIN_BURST,
+                         settings.LOGIN_IP_RATE_PER_SECOND, settings.LOGIN_IP_BURST)
+flag_limiter = _limiter("check_flag", settings.FLAG_RATE_PER_SECOND, settings.FLAG_BURST,
+                        settings.FLAG_IP_RATE_PER_SECOND, settings.FLAG_IP_BURST)
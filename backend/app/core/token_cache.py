@@ -0,0 +1,77 @@
+"""
+Cache LRU des jetons JWT dont la signature a déjà été vérifiée.
+
+Une entrée n'est servie que jusqu'à l'expiration (claim ``exp``) du jeton.
+``invalidate_user`` retire tous les jetons d'un utilisateur (désactivé ou
+supprimé) ; un index inverse utilisateur -> jetons évite de parcourir le
+cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from .config import settings
+
+
+class TokenCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[str]:
+        """Retourne le nom d'utilisateur du jeton s'il est en cache et non expiré."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                username, exp = entry
+                if exp > time.time():
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return username
+                self._remove(token)
+            self.misses += 1
+            return None
+
+    def put(self, token: str, username: str, exp: float):
+        with self._lock:
+            if token in self._entries:
+                self._entries.move_to_end(token)
+                return
+            self._entries[token] = (username, exp)
+            self._by_user.setdefault(username, set()).add(token)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, username: str):
+        with self._lock:
+            for token in list(self._by_user.get(username, ())):
+                self._remove(token)
+
+    def _remove(self, token: str):
+        username, _ = self._entries.pop(token)
+        tokens = self._by_user.get(username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[username]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
@@ -0,0 +1,142 @@
+"""
+Formats d'échange des banques de défis : NDJSON ou archive zip.
+
+- NDJSON : un défi JSON par ligne (``id``, ``title``, ``category``,
+  ``description``, ``points`` et soit ``flag`` en clair, soit le couple
+  ``flag_salt`` / ``flag_hash`` produit par l'export). L'export n'inclut
+  ce couple que sur demande (``include_flags``) : un seul tour de SHA-256
+  se retrouve hors ligne par force brute.
+- Zip : ``challenges.ndjson`` (même format) et ``manifest.json``.
+
+La lecture se fait ligne par ligne (taille de ligne bornée) et l'écriture
+produit des morceaux d'octets au fil de l'eau : ni l'import ni l'export ne
+gardent la banque complète en mémoire sous forme sérialisée.
+"""
+import json
+import time
+import zipfile
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+
+BUNDLE_ENTRY = "challenges.ndjson"
+MANIFEST_ENTRY = "manifest.json"
+EXPORT_FIELDS = ("title", "category", "description", "points")
+FLAG_FIELDS = ("flag_salt", "flag_hash")
+MAX_RECORD_BYTES = 1024 * 1024
+EXPORT_BATCH = 500  # défis par morceau envoyé
+
+
+# --- Lecture ---
+
+def _lines(f: BinaryIO) -> Iterator[Tuple[int, Optional[bytes]]]:
+    """``(numéro de ligne, contenu)`` ; contenu ``None`` si la ligne dépasse ``MAX_RECORD_BYTES``."""
+    n = 0
+    while True:
+        line = f.readline(MAX_RECORD_BYTES + 1)
+        if not line:
+            return
+        n += 1
+        if len(line) > MAX_RECORD_BYTES and not line.endswith(b"\n"):
+            # on saute le reste de la ligne
+            while line and not line.endswith(b"\n"):
+                line = f.readline(MAX_RECORD_BYTES)
+            yield n, None
+            continue
+        if line.strip():
+            yield n, line
+
+
+def iter_records(f: BinaryIO, fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Parcourt un fichier NDJSON ou une archive zip (``f`` doit alors être
+    positionnable). Produit ``(ligne, défi, erreur)`` : une ligne invalide
+    donne une erreur sans interrompre la lecture.
+    """
+    if fmt == "zip":
+        with zipfile.ZipFile(f) as zf:
+            names = zf.namelist()
+            entry = BUNDLE_ENTRY if BUNDLE_ENTRY in names else next(
+                (n for n in names if n.endswith((".ndjson", ".jsonl"))), None)
+            if entry is None:
+                raise ValueError(f"no {BUNDLE_ENTRY} in the archive")
+            with zf.open(entry) as member:
+                yield from _parse(_lines(member))
+    else:
+        yield from _parse(_lines(f))
+
+
+def _parse(lines: Iterable[Tuple[int, Optional[bytes]]]):
+    for n, line in lines:
+        if line is None:
+            yield n, None, f"record larger than {MAX_RECORD_BYTES} bytes"
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield n, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield n, None, "record must be a JSON object"
+            continue
+        yield n, record, None
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    if (filename or "").lower().endswith(".zip") or (content_type or "") in ("application/zip", "application/x-zip-compressed"):
+        return "zip"
+    return "ndjson"
+
+
+# --- Écriture ---
+
+def export_ndjson(items: Iterable[Tuple[str, dict]], include_flags: bool = False) -> Iterator[bytes]:
+    """Défis en NDJSON, ``EXPORT_BATCH`` lignes par morceau."""
+    fields = EXPORT_FIELDS + FLAG_FIELDS if include_flags else EXPORT_FIELDS
+    batch = []
+    for cid, data in items:
+        record = {"id": cid, **{k: data[k] for k in fields if k in data}}
+        batch.append(json.dumps(record, ensure_ascii=False))
+        if len(batch) >= EXPORT_BATCH:
+            yield ("\n".join(batch) + "\n").encode("utf-8")
+            batch = []
+    if batch:
+        yield ("\n".join(batch) + "\n").encode("utf-8")
+
+
+class _ZipSink:
+    """Destination non positionnable pour ``ZipFile`` : on récupère les octets au fur et à mesure."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_zip(items: Iterable[Tuple[str, dict]], count: int, include_flags: bool = False) -> Iterator[bytes]:
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        manifest = {"format": "kali-ctf-bundle", "version": 1, "challenges": count, "flags": include_flags,
+                    "exported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        zf.writestr(MANIFEST_ENTRY, json.dumps(manifest, indent=2))
+        yield sink.drain()
+        with zf.open(BUNDLE_ENTRY, "w", force_zip64=True) as entry:
+            for chunk in export_ndjson(items, include_flags):
+                entry.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+    yield sink.drain()
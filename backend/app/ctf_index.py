@@ -0,0 +1,147 @@
+"""
+Index secondaires des défis CTF, tenus à jour par ``CTFStore`` à chaque écriture.
+
+- catégorie -> ids ;
+- liste triée ``(points, seq, id)`` pour les intervalles de points (bisect) ;
+- index inversé jeton -> ids sur le titre et la description, avec un
+  vocabulaire trié pour la recherche par préfixe ;
+- numéro d'insertion ``seq`` : ordre stable des résultats (celui de ``/list``)
+  et position du curseur de pagination.
+
+Une requête part du plus petit ensemble candidat et vérifie les autres
+critères entrée par entrée : on ne parcourt jamais tout le store.
+"""
+import bisect
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> Set[str]:
+    return {t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1}
+
+
+class ChallengeIndex:
+    def __init__(self):
+        self._next_seq = 0
+        self._seq: Dict[str, int] = {}
+        self._seqs: List[int] = []              # trié
+        self._id_by_seq: Dict[int, str] = {}
+        self._docs: Dict[str, Tuple[str, int, Set[str]]] = {}  # id -> (catégorie, points, jetons)
+        self._by_category: Dict[str, Set[str]] = {}
+        self._by_points: List[Tuple[int, int, str]] = []
+        self._by_token: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []        # jetons triés
+
+    # --- Mise à jour ---
+
+    def add(self, cid: str, data: dict):
+        if cid in self._docs:
+            # mise à jour : même position dans l'ordre, nouvelles clés
+            self._unlink(cid)
+        else:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._seq[cid] = seq
+            self._seqs.append(seq)
+            self._id_by_seq[seq] = cid
+        seq = self._seq[cid]
+        category = str(data.get("category", "")).lower()
+        points = int(data.get("points", 0))
+        tokens = tokenize(f"{data.get('title', '')} {data.get('description', '')}")
+        self._docs[cid] = (category, points, tokens)
+        self._by_category.setdefault(category, set()).add(cid)
+        bisect.insort(self._by_points, (points, seq, cid))
+        for token in tokens:
+            ids = self._by_token.get(token)
+            if ids is None:
+                ids = self._by_token[token] = set()
+                bisect.insort(self._vocabulary, token)
+            ids.add(cid)
+
+    def remove(self, cid: str):
+        if cid not in self._docs:
+            return
+        self._unlink(cid)
+        del self._docs[cid]
+        seq = self._seq.pop(cid)
+        del self._id_by_seq[seq]
+        del self._seqs[bisect.bisect_left(self._seqs, seq)]
+
+    def _unlink(self, cid: str):
+        category, points, tokens = self._docs[cid]
+        seq = self._seq[cid]
+        ids = self._by_category[category]
+        ids.discard(cid)
+        if not ids:
+            del self._by_category[category]
+        del self._by_points[bisect.bisect_left(self._by_points, (points, seq, cid))]
+        for token in tokens:
+            ids = self._by_token[token]
+            ids.discard(cid)
+            if not ids:
+                del self._by_token[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    # --- Lecture ---
+
+    def _prefix_ids(self, prefix: str) -> Set[str]:
+        """Ids dont un jeton commence par ``prefix``."""
+        out: Set[str] = set()
+        i = bisect.bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            out |= self._by_token[self._vocabulary[i]]
+            i += 1
+        return out
+
+    def _points_slice(self, min_points: Optional[int], max_points: Optional[int]) -> Tuple[int, int]:
+        lo = 0 if min_points is None else bisect.bisect_left(self._by_points, (min_points,))
+        hi = len(self._by_points) if max_points is None else bisect.bisect_left(self._by_points, (max_points + 1,))
+        return lo, max(lo, hi)
+
+    def query(self, category: Optional[str] = None, min_points: Optional[int] = None,
+              max_points: Optional[int] = None, text: Optional[str] = None,
+              after: Optional[int] = None, limit: Optional[int] = None) -> Tuple[List[str], Optional[int], int]:
+        """
+        Renvoie ``(ids, seq du dernier id si une page suit, nombre total de résultats)``.
+        Tous les mots de ``text`` doivent correspondre (en préfixe d'un jeton).
+        """
+        start = -1 if after is None else after
+        has_points = min_points is not None or max_points is not None
+        words = sorted(tokenize(text or ""))
+        if category is None and not has_points and not words:
+            # pas de filtre : la liste des seq suffit
+            i = bisect.bisect_right(self._seqs, start)
+            seqs = self._seqs[i:] if limit is None else self._seqs[i:i + limit]
+            more = limit is not None and i + limit < len(self._seqs)
+            return [self._id_by_seq[s] for s in seqs], seqs[-1] if more else None, len(self._seqs)
+
+        # ensembles candidats ; le plus petit sert de base
+        candidates: List[Set[str]] = []
+        if category is not None:
+            candidates.append(self._by_category.get(category.lower(), set()))
+        for word in words:
+            candidates.append(self._prefix_ids(word))
+        if has_points:
+            lo, hi = self._points_slice(min_points, max_points)
+            if not candidates or hi - lo < min(len(c) for c in candidates):
+                candidates.append({cid for _, _, cid in self._by_points[lo:hi]})
+        base = min(candidates, key=len)
+        others = [c for c in candidates if c is not base]
+
+        seqs = []
+        for cid in base:
+            if any(cid not in c for c in others):
+                continue
+            if has_points:
+                points = self._docs[cid][1]
+                if (min_points is not None and points < min_points) or (max_points is not None and points > max_points):
+                    continue
+            seqs.append(self._seq[cid])
+        seqs.sort()
+        total = len(seqs)
+        i = bisect.bisect_right(seqs, start)
+        page = seqs[i:] if limit is None else seqs[i:i + limit]
+        more = limit is not None and i + limit < total
+        return [self._id_by_seq[s] for s in page], page[-1] if more else None, total
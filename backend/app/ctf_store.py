@@ -0,0 +1,438 @@
+"""
+Stockage des défis CTF : index en mémoire + journal append-only.
+
+Le fichier ``ctf_store.json`` reste le snapshot de référence (même format
+qu'avant : ``{id: {title, category, ...}}``). Il est lu au démarrage, puis
+chaque écriture est ajoutée en une ligne JSON dans ``ctf_store.log``. Quand
+le journal dépasse ``compact_every`` opérations, le snapshot est réécrit de
+façon atomique et le journal est remplacé par un fichier vide.
+
+Plusieurs workers uvicorn peuvent partager les mêmes fichiers : chaque
+écriture et chaque compaction se font sous un verrou de fichier
+(``ctf_store.lock``), après avoir rattrapé les lignes ajoutées par les
+autres processus. Un processus qui voit le journal changer d'inode (compacté
+ailleurs) recharge le snapshot. Côté lecture, le journal n'est examiné
+(``stat`` : inode et taille) qu'une fois par ``sync_interval`` secondes :
+les écritures d'un autre worker sont visibles avec au plus ce délai, sauf
+pour un identifiant absent, qui force la vérification.
+
+``version`` augmente à chaque changement vu par le processus : il permet de
+servir des réponses en cache.
+Les index secondaires (``ctf_index.py``) sont mis à jour avec l'index
+principal, y compris lors du rechargement du journal.
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .core.filelock import file_lock
+from .core.metrics import timed
+from .ctf_index import ChallengeIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _read_lines(path: str, pos: int, ino: Optional[int]) -> Tuple[Optional[List[dict]], int]:
+    """
+    Lignes complètes ajoutées à ``path`` depuis l'octet ``pos``. Renvoie
+    ``(None, 0)`` si le fichier n'est plus celui d'inode ``ino`` : il a été
+    remplacé et doit être relu en entier.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return (None, 0) if ino is not None else ([], 0)
+    with f:
+        st = os.fstat(f.fileno())
+        if ino is not None and st.st_ino != ino:
+            return None, 0
+        if st.st_size <= pos:
+            return [], pos
+        f.seek(pos)
+        data = f.read(st.st_size - pos)
+    # une ligne sans fin est en cours d'écriture : on la reprendra plus tard
+    end = data.rfind(b"\n") + 1
+    out = []
+    for line in data[:end].splitlines():
+        try:
+            out.append(json.loads(line))
+        except ValueError:
+            # ligne tronquée par un arrêt brutal : on l'ignore
+            continue
+    return out, pos + end
+
+
+def _log_changed(path: str, pos: int, ino: Optional[int]) -> bool:
+    """Le fichier a-t-il été remplacé ou allongé depuis ``pos`` ? (un seul ``stat``)"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return ino is not None
+    return (ino is not None and st.st_ino != ino) or st.st_size != pos
+
+
+class CTFStore:
+    def __init__(self, snapshot_file: str, compact_every: int = 1000, sync_interval: float = 0.05):
+        self.snapshot_file = snapshot_file
+        base = os.path.splitext(snapshot_file)[0]
+        self.log_file = base + ".log"
+        self.lock_file = base + ".lock"
+        self.compact_every = compact_every
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._index: Dict[str, dict] = {}
+        self.secondary = ChallengeIndex()
+        self._log = None
+        self._log_ops = 0
+        self._log_pos = 0       # octets du journal déjà appliqués
+        self._log_ino = None    # inode du journal lu
+        self._checked_at = 0.0  # dernier examen du journal (horloge monotone)
+        self._version = 0
+        self._load()
+
+    # --- Chargement ---
+
+    def _load(self):
+        with self._lock, file_lock(self.lock_file), timed("ctf_store_load"):
+            self._load_files()
+
+    def _load_files(self):
+        """(Re)lit le snapshot et le journal. Verrou de fichier tenu."""
+        self._index = {}
+        self.secondary = ChallengeIndex()
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+            for cid, data in self._index.items():
+                self.secondary.add(cid, data)
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.log_file, "a", encoding="utf-8")
+        self._log_ino = os.fstat(self._log.fileno()).st_ino
+        ops, self._log_pos = _read_lines(self.log_file, 0, self._log_ino)
+        for op in ops or ():
+            self._apply(op)
+        self._log_ops = len(ops or ())
+        self._version += 1
+
+    def _sync(self, locked: bool = False, force: bool = False):
+        """
+        Applique les écritures des autres processus. Verrou ``_lock`` tenu ;
+        ``locked`` si le verrou de fichier l'est aussi (``flock`` n'est pas réentrant).
+        Sans ``force``, ne fait rien si le journal a été examiné il y a moins
+        de ``sync_interval`` secondes ou s'il n'a pas changé depuis.
+        """
+        now = time.monotonic()
+        if not force:
+            if now - self._checked_at < self.sync_interval:
+                return
+            self._checked_at = now
+            if not _log_changed(self.log_file, self._log_pos, self._log_ino):
+                return
+        self._checked_at = now
+        ops, pos = _read_lines(self.log_file, self._log_pos, self._log_ino)
+        if ops is None:
+            # journal compacté par un autre processus
+            with contextlib.ExitStack() as stack:
+                if not locked:
+                    stack.enter_context(file_lock(self.lock_file))
+                with timed("ctf_store_load"):
+                    self._load_files()
+            return
+        if ops:
+            for op in ops:
+                self._apply(op)
+            self._log_ops += len(ops)
+            self._version += 1
+        self._log_pos = pos
+
+    def _apply(self, op: dict):
+        if op.get("op") == "put":
+            self._index[op["id"]] = op["data"]
+            self.secondary.add(op["id"], op["data"])
+        elif op.get("op") == "delete":
+            self._index.pop(op["id"], None)
+            self.secondary.remove(op["id"])
+
+    # --- Écriture ---
+
+    def _write(self, ops: List[dict]):
+        """Applique puis journalise ``ops``, après les écritures des autres processus."""
+        with self._lock, file_lock(self.lock_file):
+            self._sync(locked=True, force=True)
+            for op in ops:
+                self._apply(op)
+            with timed("ctf_store_append"):
+                self._log.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+                self._log.flush()
+            self._log_pos = os.fstat(self._log.fileno()).st_size
+            self._log_ops += len(ops)
+            self._version += 1
+            if self._log_ops >= self.compact_every:
+                self._compact()
+
+    def put(self, cid: str, data: dict):
+        self._write([{"op": "put", "id": cid, "data": data}])
+
+    def put_many(self, items: Iterable[Tuple[str, dict]]):
+        """Plusieurs écritures en un seul ajout au journal (une seule écriture disque)."""
+        ops = [{"op": "put", "id": cid, "data": data} for cid, data in items]
+        if ops:
+            self._write(ops)
+
+    def compact(self):
+        """Réécrit le snapshot à partir de l'index (à jour) puis repart d'un journal vide."""
+        with self._lock, file_lock(self.lock_file):
+            self._sync(locked=True, force=True)
+            self._compact()
+
+    def _compact(self):
+        """Verrou de fichier tenu et index à jour."""
+        with timed("ctf_store_compact"):
+            tmp = f"{self.snapshot_file}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, ensure_ascii=False, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_file)
+            # nouveau fichier (nouvel inode) : les autres processus voient la compaction
+            tmp = f"{self.log_file}.{os.getpid()}.tmp"
+            open(tmp, "w").close()
+            os.replace(tmp, self.log_file)
+            self._log.close()
+            self._log = open(self.log_file, "a", encoding="utf-8")
+            self._log_ino = os.fstat(self._log.fileno()).st_ino
+            self._log_pos = 0
+            self._log_ops = 0
+
+    def close(self):
+        with self._lock:
+            if self._log_ops:
+                self.compact()
+            self._log.close()
+
+    # --- Lecture ---
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            self._sync()
+            return self._version
+
+    def get(self, cid: str) -> Optional[dict]:
+        with self._lock:
+            self._sync()
+            data = self._index.get(cid)
+            if data is None:
+                # peut-être créé à l'instant par un autre worker
+                self._sync(force=True)
+                data = self._index.get(cid)
+            return data
+
+    def __contains__(self, cid: str) -> bool:
+        return self.get(cid) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._index)
+
+    def snapshot(self) -> Tuple[int, List[Tuple[str, dict]]]:
+        """Version et copie des entrées, lues ensemble."""
+        with self._lock:
+            self._sync()
+            return self._version, list(self._index.items())
+
+    def query(self, **filters) -> Tuple[int, List[Tuple[str, dict]], Optional[int], int]:
+        """
+        Filtre via les index secondaires (voir ``ChallengeIndex.query``).
+        Renvoie ``(version, [(id, données)], curseur suivant, total)``.
+        """
+        with self._lock:
+            self._sync()
+            ids, next_after, total = self.secondary.query(**filters)
+            return self._version, [(cid, self._index[cid]) for cid in ids], next_after, total
+
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        return iter(self.snapshot()[1])
+
+
+class _Claim:
+    """Résolution en attente d'écriture ; ``ok`` est fixé par le thread d'écriture."""
+
+    __slots__ = ("user", "cid", "ts", "ok", "error", "done")
+
+    def __init__(self, user: str, cid: str, ts: float):
+        self.user, self.cid, self.ts = user, cid, ts
+        self.ok = False
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class SolveLedger:
+    """
+    Registre des résolutions (utilisateur, défi) -> horodatage, partagé par
+    les workers via ``ctf_solves.log``.
+
+    Les recherches se font en mémoire ; les lignes des autres processus sont
+    rattrapées au plus une fois par ``sync_interval`` secondes (``stat``
+    seulement si rien n'a changé).
+
+    Les nouvelles résolutions sont écrites par lots (group commit) : un
+    thread d'arrière-plan prend toutes celles arrivées pendant l'écriture
+    précédente et, sous un seul verrou de fichier, rattrape le journal,
+    écarte celles qui y figurent déjà puis ajoute les autres en une seule
+    écriture. ``record`` attend ce verdict : un même utilisateur ne marque
+    les points d'un défi qu'une fois, quel que soit le worker qui reçoit la
+    soumission.
+
+    Les abonnés (``subscribe``) sont appelés pour chaque nouvelle résolution,
+    qu'elle vienne de ce processus ou d'un autre : le même thread relit le
+    journal toutes les ``poll_interval`` secondes quand il n'a rien à écrire.
+    """
+
+    def __init__(self, log_file: str, sync_interval: float = 0.05, poll_interval: float = 1.0):
+        self.log_file = log_file
+        self.lock_file = log_file + ".lock"
+        self.sync_interval = sync_interval
+        self.poll_interval = poll_interval
+        self._listeners: List[Callable[[str, str, float], None]] = []
+        self._lock = threading.Lock()
+        self._solves: Dict[Tuple[str, str], float] = {}
+        self._pos = 0
+        self._checked_at = 0.0
+        self._pending: List[_Claim] = []
+        self._wakeup = threading.Condition(threading.Lock())
+        self._stopped = False
+        self._log = open(self.log_file, "a", encoding="utf-8")
+        with self._lock:
+            self._sync(force=True)
+        self._thread = threading.Thread(target=self._run, name="ctf-solve-ledger", daemon=True)
+        self._thread.start()
+
+    def _sync(self, force: bool = False):
+        """Ajoute les résolutions écrites par les autres processus. Verrou ``_lock`` tenu."""
+        now = time.monotonic()
+        if not force:
+            if now - self._checked_at < self.sync_interval:
+                return
+            self._checked_at = now
+            if not _log_changed(self.log_file, self._pos, None):
+                return
+        self._checked_at = now
+        recs, self._pos = _read_lines(self.log_file, self._pos, None)
+        new = []
+        for rec in recs:
+            key = (rec["user"], rec["id"])
+            if key not in self._solves:
+                self._solves[key] = rec["ts"]
+                new.append((key, rec["ts"]))
+        self._notify(new)
+
+    def _notify(self, solves: List[Tuple[Tuple[str, str], float]]):
+        """Verrou ``_lock`` tenu : les abonnés voient les résolutions dans l'ordre du journal."""
+        for (user, cid), ts in solves:
+            for listener in self._listeners:
+                try:
+                    listener(user, cid, ts)
+                except Exception:
+                    # un abonné défaillant ne doit pas bloquer le registre
+                    logger.exception("solve listener failed")
+
+    def subscribe(self, listener: Callable[[str, str, float], None]):
+        """
+        Appelle ``listener(user, cid, ts)`` pour les résolutions déjà connues
+        (par horodatage croissant), puis pour chaque nouvelle.
+        """
+        with self._lock:
+            self._sync(force=True)
+            known = sorted(self._solves.items(), key=lambda item: item[1])
+            for (user, cid), ts in known:
+                listener(user, cid, ts)
+            self._listeners.append(listener)
+
+    def sync(self):
+        """Rattrape les résolutions des autres processus (limité à une fois par ``sync_interval``)."""
+        with self._lock:
+            self._sync()
+
+    def record(self, user: str, cid: str, ts: float) -> bool:
+        """Enregistre une résolution. Retourne False si elle existait déjà."""
+        with self._lock:
+            if (user, cid) in self._solves:
+                return False
+        claim = _Claim(user, cid, ts)
+        with self._wakeup:
+            stopped = self._stopped
+            if not stopped:
+                self._pending.append(claim)
+                self._wakeup.notify()
+        if stopped:
+            self._commit([claim])
+        claim.done.wait()
+        if claim.error is not None:
+            raise claim.error
+        return claim.ok
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                if not self._pending and not self._stopped:
+                    self._wakeup.wait(self.poll_interval)
+                batch, self._pending = self._pending, []
+            if batch:
+                self._commit(batch)
+            elif self._stopped:
+                return
+            elif self._listeners:
+                self.sync()
+
+    def _commit(self, batch: List[_Claim]):
+        """Décide et écrit un lot de résolutions sous le verrou de fichier."""
+        try:
+            with self._lock, file_lock(self.lock_file), timed("ctf_ledger_record"):
+                self._sync(force=True)
+                # le premier arrivé (journal, puis ordre du lot) l'emporte
+                winners: Dict[Tuple[str, str], _Claim] = {}
+                for claim in batch:
+                    key = (claim.user, claim.cid)
+                    if key not in self._solves and key not in winners:
+                        winners[key] = claim
+                if winners:
+                    self._log.write("".join(
+                        json.dumps({"user": c.user, "id": c.cid, "ts": c.ts}, ensure_ascii=False) + "\n"
+                        for c in winners.values()))
+                    self._log.flush()
+                    self._pos = os.fstat(self._log.fileno()).st_size
+                for key, claim in winners.items():
+                    self._solves[key] = claim.ts
+                    claim.ok = True
+                self._notify([(key, claim.ts) for key, claim in winners.items()])
+        except Exception as e:
+            for claim in batch:
+                claim.ok, claim.error = False, e
+        finally:
+            for claim in batch:
+                claim.done.set()
+
+    def has_solved(self, user: str, cid: str) -> bool:
+        with self._lock:
+            self._sync()
+            return (user, cid) in self._solves
+
+    def items(self) -> List[Tuple[Tuple[str, str], float]]:
+        with self._lock:
+            self._sync()
+            return list(self._solves.items())
+
+    def close(self):
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+        self._thread.join()
+        with self._lock:
+            self._log.close()
@@ -1,59 +1,270 @@
-from typing import Dict, Optional
+from typing import List, Optional, Tuple
 from passlib.context import CryptContext
+import asyncio
+import os
+import sqlite3
 import uuid
 
-# Nous devrons créer ce fichier models.py juste après.
-# Pour le moment, nous allons le copier ici si vous ne l'avez pas déjà fait.
+from .core.config import settings
+from .core.metrics import timed
+from .core.token_cache import token_cache
 
-# --- Définition temporaire de UserInDB pour éviter l'erreur d'import ---
-# Si vous avez déjà créé backend/app/models.py, ignorez ce bloc.
+# --- Objet utilisateur retourné par le dépôt ---
 class UserInDB:
-    def __init__(self, username, hashed_password, user_id=None, email=None):
+    def __init__(self, username, hashed_password, user_id=None, email=None, full_name=None, disabled=False):
         self.username = username
         self.hashed_password = hashed_password
         self.email = email
+        self.full_name = full_name
+        self.disabled = bool(disabled)
         self.user_id = user_id if user_id else str(uuid.uuid4())
 
 # --- Configuration du hashage des mots de passe ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Les hachages créés avec un coût différent de BCRYPT_ROUNDS sont signalés
+# par verify_and_update et refaits à la connexion suivante.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
-# --- Fausse Base de Données en Mémoire ---
-# Simule une collection d'utilisateurs
-# Clé: Nom d'utilisateur (str), Valeur: Objet UserInDB
-FAKE_USERS_DB: Dict[str, UserInDB] = {}
+
+# --- Dépôts d'utilisateurs (SQLite ou Postgres, pilotes asynchrones) ---
+#
+# Les requêtes sont des constantes paramétrées : SQLite garde les
+# instructions préparées en cache par connexion, et asyncpg prépare et met
+# en cache chaque requête par connexion du pool. L'index unique sur
+# `username` garantit l'unicité même entre plusieurs workers.
+
+USER_COLUMNS = "user_id, username, email, full_name, disabled, hashed_password"
+
+def _row_to_user(row) -> UserInDB:
+    user_id, username, email, full_name, disabled, hashed_password = row
+    return UserInDB(username=username, hashed_password=hashed_password, user_id=user_id,
+                    email=email, full_name=full_name, disabled=disabled)
+
+
+class SQLiteUserRepository:
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS users ("
+        " user_id TEXT PRIMARY KEY,"
+        " username TEXT NOT NULL,"
+        " email TEXT,"
+        " full_name TEXT,"
+        " disabled INTEGER NOT NULL DEFAULT 0,"
+        " hashed_password TEXT NOT NULL)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS users_username_idx ON users (username)",
+    )
+    GET = f"SELECT {USER_COLUMNS} FROM users WHERE username = ?"
+    INSERT = f"INSERT INTO users ({USER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)"
+    UPDATE_HASH = "UPDATE users SET hashed_password = ? WHERE username = ?"
+    SET_DISABLED = "UPDATE users SET disabled = ? WHERE username = ?"
+    DELETE = "DELETE FROM users WHERE username = ?"
+
+    def __init__(self, path: str, pool_size: int):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool: Optional[asyncio.Queue] = None
+        self._connections: List = []
+
+    async def connect(self):
+        import aiosqlite
+        pool: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.pool_size):
+            # autocommit : chaque requête est atomique, aucune transaction ne reste ouverte
+            conn = await aiosqlite.connect(self.path, isolation_level=None, cached_statements=64)
+            # WAL : lectures concurrentes pendant les écritures, entre workers
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            await conn.execute("PRAGMA busy_timeout=5000")
+            self._connections.append(conn)
+            pool.put_nowait(conn)
+        conn = self._connections[0]
+        for stmt in self.SCHEMA:
+            await conn.execute(stmt)
+        self._pool = pool
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+        self._pool = None
+
+    async def _execute(self, sql: str, params: tuple, fetch: bool = False):
+        conn = await self._pool.get()
+        try:
+            cursor = await conn.execute(sql, params)
+            if fetch:
+                return await cursor.fetchone()
+            return cursor.rowcount
+        finally:
+            self._pool.put_nowait(conn)
+
+    async def get_user(self, username: str) -> Optional[UserInDB]:
+        row = await self._execute(self.GET, (username,), fetch=True)
+        return _row_to_user(row) if row else None
+
+    async def insert_user(self, user: UserInDB) -> None:
+        try:
+            await self._execute(self.INSERT, (user.user_id, user.username, user.email,
+                                              user.full_name, int(user.disabled), user.hashed_password))
+        except sqlite3.IntegrityError:
+            raise ValueError("L'utilisateur existe déjà.")
+
+    async def update_password_hash(self, username: str, hashed_password: str) -> None:
+        await self._execute(self.UPDATE_HASH, (hashed_password, username))
+
+    async def set_disabled(self, username: str, disabled: bool) -> bool:
+        return await self._execute(self.SET_DISABLED, (int(disabled), username)) > 0
+
+    async def delete_user(self, username: str) -> bool:
+        return await self._execute(self.DELETE, (username,)) > 0
+
+
+class PostgresUserRepository:
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS users ("
+        " user_id TEXT PRIMARY KEY,"
+        " username TEXT NOT NULL,"
+        " email TEXT,"
+        " full_name TEXT,"
+        " disabled BOOLEAN NOT NULL DEFAULT FALSE,"
+        " hashed_password TEXT NOT NULL)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS users_username_idx ON users (username)",
+    )
+    GET = f"SELECT {USER_COLUMNS} FROM users WHERE username = $1"
+    INSERT = f"INSERT INTO users ({USER_COLUMNS}) VALUES ($1, $2, $3, $4, $5, $6)"
+    UPDATE_HASH = "UPDATE users SET hashed_password = $1 WHERE username = $2"
+    SET_DISABLED = "UPDATE users SET disabled = $1 WHERE username = $2"
+    DELETE = "DELETE FROM users WHERE username = $1"
+
+    def __init__(self, dsn: str, pool_size: int):
+        self.dsn = dsn
+        self.pool_size = pool_size
+        self._pool = None
+
+    async def connect(self):
+        try:
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("DATABASE_BACKEND=postgres nécessite le paquet asyncpg.")
+        self._asyncpg = asyncpg
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.pool_size)
+        async with self._pool.acquire() as conn:
+            for stmt in self.SCHEMA:
+                await conn.execute(stmt)
+
+    async def close(self):
+        await self._pool.close()
+        self._pool = None
+
+    @staticmethod
+    def _affected(status: str) -> int:
+        # asyncpg retourne par ex. "UPDATE 1"
+        return int(status.rsplit(" ", 1)[-1])
+
+    async def get_user(self, username: str) -> Optional[UserInDB]:
+        row = await self._pool.fetchrow(self.GET, username)
+        return _row_to_user(tuple(row)) if row else None
+
+    async def insert_user(self, user: UserInDB) -> None:
+        try:
+            await self._pool.execute(self.INSERT, user.user_id, user.username, user.email,
+                                     user.full_name, user.disabled, user.hashed_password)
+        except self._asyncpg.UniqueViolationError:
+            raise ValueError("L'utilisateur existe déjà.")
+
+    async def update_password_hash(self, username: str, hashed_password: str) -> None:
+        await self._pool.execute(self.UPDATE_HASH, hashed_password, username)
+
+    async def set_disabled(self, username: str, disabled: bool) -> bool:
+        return self._affected(await self._pool.execute(self.SET_DISABLED, disabled, username)) > 0
+
+    async def delete_user(self, username: str) -> bool:
+        return self._affected(await self._pool.execute(self.DELETE, username)) > 0
+
+
+def _make_repository():
+    if settings.DATABASE_BACKEND == "postgres":
+        return PostgresUserRepository(settings.POSTGRES_DSN, settings.DB_POOL_SIZE)
+    if settings.DATABASE_BACKEND != "sqlite":
+        raise RuntimeError(f"DATABASE_BACKEND inconnu : {settings.DATABASE_BACKEND}")
+    path = settings.SQLITE_PATH or os.path.join(os.path.dirname(__file__), "db.sqlite3")
+    return SQLiteUserRepository(path, settings.DB_POOL_SIZE)
+
+users = _make_repository()
+_connected = False
+_connect_lock: Optional[asyncio.Lock] = None
+
+async def init_db() -> None:
+    """Ouvre le pool de connexions (appelé au démarrage, ou au premier accès)."""
+    global _connected, _connect_lock
+    if _connected:
+        return
+    if _connect_lock is None:
+        _connect_lock = asyncio.Lock()
+    async with _connect_lock:
+        if not _connected:
+            await users.connect()
+            _connected = True
+
+async def close_db() -> None:
+    global _connected
+    if _connected:
+        await users.close()
+        _connected = False
 
 
 # --- Fonctions Utilitaires ---
 
 def get_password_hash(password: str) -> str:
     """Retourne le hash bcrypt d'un mot de passe."""
-    return pwd_context.hash(password)
+    with timed("bcrypt_hash"):
+        return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifie si le mot de passe clair correspond au hash stocké."""
     return pwd_context.verify(plain_password, hashed_password)
 
-def get_user(username: str) -> Optional[UserInDB]:
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Vérifie le mot de passe et retourne un nouveau hash si la politique a changé."""
+    with timed("bcrypt_verify"):
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def get_user(username: str) -> Optional[UserInDB]:
     """Récupère un utilisateur par son nom d'utilisateur."""
-    # Simule la recherche dans la DB
-    user_data = FAKE_USERS_DB.get(username)
-    if user_data:
-        return user_data
-    return None
-
-def create_user(user_data: dict) -> UserInDB:
-    """Ajoute un nouvel utilisateur à la fausse base de données."""
-    username = user_data['username']
-    
-    if username in FAKE_USERS_DB:
-        raise ValueError("L'utilisateur existe déjà.")
-    
-    # Création de l'objet UserInDB
+    await init_db()
+    return await users.get_user(username)
+
+async def create_user(user_data: dict) -> UserInDB:
+    """Ajoute un nouvel utilisateur (ValueError si le nom est déjà pris)."""
+    await init_db()
     user = UserInDB(
-        username=username, 
+        username=user_data['username'],
         hashed_password=user_data['hashed_password'],
-        email=user_data.get('email')
+        email=user_data.get('email'),
+        full_name=user_data.get('full_name'),
     )
-    
-    FAKE_USERS_DB[username] = user
-    return user
\ No newline at end of file
+    await users.insert_user(user)
+    return user
+
+async def update_user_password_hash(username: str, hashed_password: str) -> None:
+    """Remplace le hash stocké (ex. après un changement de coût bcrypt)."""
+    await init_db()
+    await users.update_password_hash(username, hashed_password)
+
+async def set_user_disabled(username: str, disabled: bool = True) -> bool:
+    """Active / désactive un compte ; les jetons en cache sont invalidés."""
+    await init_db()
+    changed = await users.set_disabled(username, disabled)
+    token_cache.invalidate_user(username)
+    return changed
+
+async def delete_user(username: str) -> bool:
+    """Supprime un compte ; les jetons en cache sont invalidés."""
+    await init_db()
+    deleted = await users.delete_user(username)
+    token_cache.invalidate_user(username)
+    return deleted
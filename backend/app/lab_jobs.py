@@ -0,0 +1,531 @@
+"""
+Planificateur asynchrone des déploiements de labs.
+
+Une demande de déploiement crée un ``LabJob`` et rend la main tout de
+suite. Des workers asyncio (au plus ``max_concurrent``) exécutent
+``docker-compose ... up -d <lab>`` via ``asyncio.create_subprocess_exec``
+et conservent les dernières lignes de sortie pour l'endpoint de statut.
+
+- Les demandes simultanées pour le même lab (projet compose partagé) sont
+  regroupées sur un seul job : 30 clics « deploy » = un seul ``up -d``.
+- Un pool optionnel d'instances pré-démarrées (chacune dans son propre
+  projet compose) permet une remise instantanée ; il est re-rempli en
+  arrière-plan après chaque remise, et après un échec avec un délai
+  croissant (``retry_delay * 2^n``, plafonné à ``retry_max_delay``).
+- Chaque instance du pool publie son propre port hôte (``LAB_HTTP_PORT``,
+  à partir de ``warm_port_base``) : le fichier compose doit utiliser cette
+  variable, un port hôte fixe désactive le pool.
+- Une instance remise est détruite (``down -v``) après ``instance_ttl``
+  secondes ou sur demande (``release``). À l'arrêt, les instances encore
+  dans le pool sont détruites et les jobs en attente passent à ``cancelled``.
+
+Avec plusieurs workers uvicorn, chaque processus a son planificateur. Si
+``state_dir`` est fourni, ils partagent par fichiers (``JobBoard``) :
+
+- l'état des jobs (un fichier JSON par job, réécrit à chaque transition et
+  au plus une fois par seconde pendant l'exécution) : le statut d'un job est
+  visible depuis n'importe quel worker ;
+- le job en cours par lab, sous verrou : le regroupement des demandes vaut
+  pour tous les workers ;
+- la remise des instances : ``release`` sur un autre worker marque
+  l'instance comme rendue et la détruit ; le propriétaire l'oublie à la
+  prochaine passe du nettoyeur.
+
+Chaque worker réserve aussi une tranche de ``port_range`` ports
+(``warm_port_base + n * port_range``) par un verrou non bloquant sur
+``port-slot-<n>.lock``, libéré à l'arrêt ou à la mort du processus.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from .core.filelock import file_lock, try_lock
+
+# ports publiés avec un port hôte littéral : "8081:80", "127.0.0.1:8081:80", published: 8081
+_FIXED_PORT_RE = re.compile(
+    r"""^\s*(?:-\s*["']?(?:\d{1,3}(?:\.\d{1,3}){3}:)?\d+(?:-\d+)?:\d+|published:\s*["']?\d+)""", re.M)
+PORT_VARIABLE = "LAB_HTTP_PORT"
+
+
+class LabJob:
+    def __init__(self, lab: str, project: Optional[str] = None, warm: bool = False, log_tail: int = 200,
+                 action: str = "up", port: Optional[int] = None):
+        self.id = str(uuid.uuid4())
+        self.lab = lab
+        self.project = project
+        self.warm = warm
+        self.action = action    # up | down
+        self.port = port        # port hôte des instances du pool
+        self.status = "queued"  # queued -> running -> deployed | removed | error ; queued -> cancelled
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.expires_at: Optional[float] = None
+        self.returncode: Optional[int] = None
+        self.detail: Optional[str] = None
+        self.log: Deque[str] = deque(maxlen=log_tail)
+        self.done = asyncio.Event()
+
+    def to_dict(self, tail: Optional[int] = None) -> dict:
+        log = list(self.log)
+        return {
+            "job_id": self.id,
+            "lab": self.lab,
+            "project": self.project,
+            "action": self.action,
+            "port": self.port,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "expires_at": self.expires_at,
+            "returncode": self.returncode,
+            "detail": self.detail,
+            "log_tail": log[-tail:] if tail else log,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LabJob":
+        """Vue d'un job d'un autre worker (lue dans le ``JobBoard``)."""
+        job = cls(data["lab"], project=data["project"], action=data["action"], port=data["port"])
+        job.id = data["job_id"]
+        for field in ("status", "created_at", "started_at", "finished_at", "expires_at", "returncode", "detail"):
+            setattr(job, field, data[field])
+        job.log.extend(data["log_tail"])
+        if job.status not in ("queued", "running"):
+            job.done.set()
+        return job
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobBoard:
+    """
+    État des jobs partagé entre les workers d'une même machine : un fichier
+    ``<job_id>.json`` par job (``{"job", "owner", "handed_out", "released"}``)
+    et ``active.json`` (lab -> job en cours). Les modifications croisées se
+    font sous ``lock()``.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock_file = os.path.join(directory, "jobs.lock")
+
+    def lock(self):
+        return file_lock(self.lock_file)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, path: str, data: dict):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _read(self, path: str) -> Optional[dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, job: LabJob, handed_out: bool = False, released: bool = False):
+        self._write(self._path(job.id), {"job": job.to_dict(), "owner": os.getpid(),
+                                         "handed_out": handed_out, "released": released})
+
+    def load(self, job_id: str) -> Optional[dict]:
+        if not re.fullmatch(r"[0-9a-f-]{36}", job_id):
+            return None
+        return self._read(self._path(job_id))
+
+    def remove(self, job_id: str):
+        try:
+            os.remove(self._path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def active(self, lab: str) -> Optional[dict]:
+        """Job en attente ou en cours pour ``lab`` sur un worker vivant. Verrou tenu."""
+        job_id = (self._read(os.path.join(self.directory, "active.json")) or {}).get(lab)
+        entry = self.load(job_id) if job_id else None
+        if entry is None or entry["job"]["status"] not in ("queued", "running") or not _pid_alive(entry["owner"]):
+            return None
+        return entry
+
+    def set_active(self, lab: str, job_id: str):
+        """Verrou tenu."""
+        path = os.path.join(self.directory, "active.json")
+        active = self._read(path) or {}
+        active[lab] = job_id
+        self._write(path, active)
+
+    def sweep(self, max_age: float):
+        """Supprime les fichiers de jobs non modifiés depuis ``max_age`` secondes."""
+        limit = time.time() - max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".json") and name != "active.json":
+                try:
+                    if os.path.getmtime(path) < limit:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class QueueFull(Exception):
+    """Trop de déploiements en attente."""
+
+
+class LabScheduler:
+    def __init__(self, compose_command: List[str], labs_dir: str, max_concurrent: int = 2,
+                 queue_size: int = 100, warm_pool_size: int = 0, warm_pool_lab: str = "vulnerable-web",
+                 log_tail: int = 200, max_jobs: int = 1000, warm_port_base: int = 18080,
+                 instance_ttl: float = 7200.0, retry_delay: float = 5.0, retry_max_delay: float = 300.0,
+                 state_dir: Optional[str] = None, port_range: int = 100, job_retention: float = 86400.0):
+        self.compose_command = compose_command
+        self.labs_dir = labs_dir
+        self.compose_file = os.path.join(labs_dir, "docker-compose.lab.yml")
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.warm_pool_size = warm_pool_size
+        self.warm_pool_lab = warm_pool_lab
+        self.warm_port_base = warm_port_base
+        self.port_range = port_range
+        self.job_retention = job_retention
+        self.board = JobBoard(state_dir) if state_dir else None
+        self.port_slot = 0
+        self._slot_lock = None
+        self.instance_ttl = instance_ttl
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.log_tail = log_tail
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, LabJob] = {}
+        self.warm_pool_error: Optional[str] = None
+        self._active_by_lab: Dict[str, LabJob] = {}
+        self._ready: Deque[LabJob] = deque()
+        self._handed_out: Dict[str, LabJob] = {}
+        self._ports: Set[int] = set()
+        self._warming = 0
+        self._warm_failures = 0
+        self._retry: Optional[asyncio.TimerHandle] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    # --- Cycle de vie ---
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._stopping = False
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent)]
+            self._reaper = asyncio.create_task(self._reap())
+
+    def _claim_port_slot(self):
+        """Réserve une tranche de ports propre à ce processus (verrou tenu jusqu'à l'arrêt)."""
+        if self.board is None or self._slot_lock is not None:
+            return
+        for slot in range(1000):
+            f = try_lock(os.path.join(self.board.directory, f"port-slot-{slot}.lock"))
+            if f is not None:
+                self._slot_lock, self.port_slot = f, slot
+                return
+        self.warm_pool_error = "no free port slot for this worker"
+
+    async def start(self):
+        if self.board is not None:
+            self.board.sweep(max(self.job_retention, self.instance_ttl))
+            self._claim_port_slot()
+        if self.warm_pool_size and self.compose_file_exists():
+            with open(self.compose_file, "r", encoding="utf-8") as f:
+                if _FIXED_PORT_RE.search(f.read()):
+                    self.warm_pool_error = (f"{self.compose_file} publishes a fixed host port; "
+                                            f"use ${{{PORT_VARIABLE}}} to enable the warm pool")
+        self._ensure_started()
+        self._refill_pool()
+
+    async def stop(self, timeout: float = 60.0):
+        self._stopping = True
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        # instances du pool jamais remises (prêtes ou en cours de démarrage)
+        idle = list(self._ready) + [j for j in self.jobs.values()
+                                    if j.warm and j.action == "up" and j.status == "running"]
+        self._ready.clear()
+        tasks = self._workers + ([self._reaper] if self._reaper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._reaper = None
+        self._queue = None
+        # jamais démarrés : ils ne le seront plus
+        for job in self.jobs.values():
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.detail = "scheduler stopped"
+                job.finished_at = time.time()
+                job.done.set()
+                self._save(job)
+        if idle:
+            downs = [self._teardown_job(job) for job in idle]
+            await asyncio.wait([asyncio.ensure_future(self._run(job)) for job in downs], timeout=timeout)
+        if self._slot_lock is not None:
+            self._slot_lock.close()
+            self._slot_lock = None
+
+    # --- Soumission ---
+
+    def compose_file_exists(self) -> bool:
+        return os.path.exists(self.compose_file)
+
+    def submit(self, lab: str) -> LabJob:
+        self._ensure_started()
+        if lab == self.warm_pool_lab and self._ready:
+            job = self._ready.popleft()
+            job.expires_at = time.time() + self.instance_ttl
+            self._handed_out[job.id] = job
+            self._save(job)
+            self._refill_pool()
+            return job
+        active = self._active_by_lab.get(lab)
+        if active is not None and not active.done.is_set():
+            return active
+        if self.board is None:
+            job = self._enqueue(LabJob(lab, log_tail=self.log_tail))
+        else:
+            with self.board.lock():
+                # même lab déjà demandé à un autre worker
+                other = self.board.active(lab)
+                if other is not None:
+                    return LabJob.from_dict(other["job"])
+                job = self._enqueue(LabJob(lab, log_tail=self.log_tail))
+                self.board.set_active(lab, job.id)
+        self._active_by_lab[lab] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[LabJob]:
+        """Job de ce worker, ou vue du job d'un autre worker (``None`` si inconnu)."""
+        job = self.jobs.get(job_id)
+        if job is None and self.board is not None:
+            entry = self.board.load(job_id)
+            if entry is not None:
+                job = LabJob.from_dict(entry["job"])
+        return job
+
+    def release(self, job_id: str) -> Optional[LabJob]:
+        """Détruit une instance remise ; renvoie le job ``down`` (``None`` si inconnue ou déjà rendue)."""
+        job = self._handed_out.get(job_id)
+        if self.board is None:
+            if job is None:
+                return None
+            self._ensure_started()
+            down = self._enqueue(self._teardown_job(job))
+            del self._handed_out[job_id]
+            return down
+        with self.board.lock():
+            entry = self.board.load(job_id)
+            if entry is not None and entry["released"]:
+                return None
+            if job is None:
+                if entry is None or not entry["handed_out"]:
+                    return None
+                # remise par un autre worker : son propriétaire l'oubliera (voir _reap)
+                job = LabJob.from_dict(entry["job"])
+            self._ensure_started()
+            down = self._enqueue(self._teardown_job(job))
+            self.board.save(job, handed_out=True, released=True)
+        self._handed_out.pop(job_id, None)
+        return down
+
+    def _enqueue(self, job: LabJob) -> LabJob:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFull()
+        self.jobs[job.id] = job
+        self._save(job)
+        self._prune()
+        return job
+
+    def _save(self, job: LabJob):
+        if self.board is not None:
+            self.board.save(job, handed_out=job.id in self._handed_out)
+
+    def _teardown_job(self, job: LabJob) -> LabJob:
+        return LabJob(job.lab, project=job.project, log_tail=self.log_tail, action="down", port=job.port)
+
+    def _allocate_port(self) -> Optional[int]:
+        """Premier port libre de la tranche de ce worker (None si elle est pleine)."""
+        base = self.warm_port_base + self.port_slot * self.port_range
+        for port in range(base, base + self.port_range):
+            if port not in self._ports:
+                self._ports.add(port)
+                return port
+        return None
+
+    def _refill_pool(self):
+        if self.warm_pool_error or self._retry is not None:
+            return
+        while len(self._ready) + self._warming < self.warm_pool_size:
+            port = self._allocate_port()
+            if port is None:
+                return
+            job = LabJob(self.warm_pool_lab, project=f"kali-lab-{uuid.uuid4().hex[:8]}",
+                         warm=True, log_tail=self.log_tail, port=port)
+            try:
+                self._enqueue(job)
+            except QueueFull:
+                self._ports.discard(job.port)
+                self._schedule_refill()
+                return
+            self._warming += 1
+
+    def _schedule_refill(self):
+        """Re-remplit le pool plus tard, avec un délai qui double à chaque échec consécutif."""
+        if self._retry is not None:
+            return
+        delay = min(self.retry_max_delay, self.retry_delay * 2 ** max(0, self._warm_failures - 1))
+        self._retry = asyncio.get_running_loop().call_later(delay, self._retry_refill)
+
+    def _retry_refill(self):
+        self._retry = None
+        self._refill_pool()
+
+    def _prune(self):
+        # garde la mémoire bornée : on oublie les plus anciens jobs terminés
+        if len(self.jobs) <= self.max_jobs:
+            return
+        for job_id, job in list(self.jobs.items()):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if job.done.is_set() and job not in self._ready and job_id not in self._handed_out:
+                del self.jobs[job_id]
+                if self.board is not None:
+                    self.board.remove(job_id)
+
+    async def _reap(self):
+        """Détruit les instances remises dont la durée de vie est écoulée."""
+        while True:
+            await asyncio.sleep(min(60.0, self.instance_ttl))
+            now = time.time()
+            for job_id, job in list(self._handed_out.items()):
+                entry = self.board.load(job_id) if self.board is not None else None
+                if entry is not None and entry["released"]:
+                    # rendue via un autre worker, qui l'a détruite
+                    del self._handed_out[job_id]
+                    self._ports.discard(job.port)
+                elif job.expires_at is not None and job.expires_at <= now:
+                    try:
+                        self.release(job_id)
+                    except QueueFull:
+                        pass
+
+    # --- Exécution ---
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+                self._finished(job)
+
+    def _finished(self, job: LabJob):
+        if self._stopping:
+            return
+        if job.action == "down":
+            self._ports.discard(job.port)
+        elif job.warm:
+            self._warming -= 1
+            if job.status == "deployed":
+                self._warm_failures = 0
+                self._ready.append(job)
+            else:
+                self._warm_failures += 1
+                try:
+                    # nettoie un projet à moitié démarré
+                    self._enqueue(self._teardown_job(job))
+                except QueueFull:
+                    self._ports.discard(job.port)
+                self._schedule_refill()
+
+    async def _run(self, job: LabJob):
+        job.status = "running"
+        job.started_at = time.time()
+        self._save(job)
+        saved_at = time.monotonic()
+        cmd = list(self.compose_command) + ["-f", self.compose_file]
+        if job.project:
+            cmd += ["-p", job.project]
+        cmd += ["up", "-d", job.lab] if job.action == "up" else ["down", "-v", "--remove-orphans"]
+        env = None
+        if job.port is not None:
+            env = {**os.environ, PORT_VARIABLE: str(job.port)}
+        proc = None
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, cwd=self.labs_dir, env=env,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            )
+            async for line in proc.stdout:
+                job.log.append(line.decode("utf-8", errors="replace").rstrip())
+                if self.board is not None and time.monotonic() - saved_at >= 1.0:
+                    self._save(job)
+                    saved_at = time.monotonic()
+            job.returncode = await proc.wait()
+            if job.returncode == 0:
+                job.status = "deployed" if job.action == "up" else "removed"
+            else:
+                job.status = "error"
+                job.detail = f"Command {cmd} returned non-zero exit status {job.returncode}."
+        except (OSError, asyncio.CancelledError) as e:
+            job.status = "error"
+            job.detail = str(e) or type(e).__name__
+            if isinstance(e, asyncio.CancelledError):
+                # arrêt du planificateur : on n'abandonne pas le processus
+                if proc is not None and proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                raise
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+            self._save(job)
+
+    # --- Statistiques ---
+
+    def stats(self) -> dict:
+        running = sum(1 for j in self.jobs.values() if j.status == "running")
+        queued = sum(1 for j in self.jobs.values() if j.status == "queued")
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": running,
+            "queued": queued,
+            "warm_ready": len(self._ready),
+            "warm_starting": self._warming,
+            "warm_pool_size": self.warm_pool_size,
+            "port_slot": self.port_slot,
+            "warm_pool_error": self.warm_pool_error,
+            "warm_retry_pending": self._retry is not None,
+            "handed_out": len(self._handed_out),
+        }
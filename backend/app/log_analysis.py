@@ -0,0 +1,200 @@
+"""
+Moteur d'analyse de journaux (syslog, auth.log...).
+
+- Les règles (nom + expression régulière) sont compilées en une seule
+  expression alternée : chaque ligne n'est parcourue qu'une fois, quel que
+  soit le nombre de règles.
+- Sur les lignes qui correspondent, on extrait l'IP source, l'utilisateur
+  et l'horodatage, puis on agrège : compteurs par règle, histogramme par
+  tranche de temps et « top-k » des IP / utilisateurs fautifs.
+- Le top-k utilise un résumé Misra-Gries (mémoire bornée, fusionnable), ce
+  qui permet de découper un gros fichier en tranches traitées en parallèle
+  dans des processus séparés puis de fusionner les résultats partiels.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_RULES: Tuple[Tuple[str, str, bool], ...] = (
+    # (nom, expression, compte comme échec d'authentification)
+    ("ssh_failed_password", r"Failed password for", True),
+    ("ssh_invalid_user", r"Invalid user \S+", True),
+    ("pam_auth_failure", r"authentication failure", True),
+    ("failed_login", r"(?i:FAILED LOGIN)", True),
+    ("auth_fail", r"(?i:AUTH FAIL)", True),
+    ("sudo_incorrect_password", r"incorrect password attempts?", True),
+    ("ssh_accepted", r"Accepted (?:password|publickey) for", False),
+)
+
+BUCKETS = {"minute": 16, "hour": 13, "day": 10}  # longueur du préfixe ISO conservé
+SKETCH_CAPACITY = 1024
+MAX_EXAMPLES = 10
+
+_IP_RE = re.compile(rb"\b(\d{1,3}(?:\.\d{1,3}){3})\b")
+_USER_RE = re.compile(rb"(?:\buser[= ]|\bfor (?:invalid user )?)([\w.@-]+)")
+_ISO_TS_RE = re.compile(rb"^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})")
+_SYSLOG_TS_RE = re.compile(rb"^([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}:\d{2}:\d{2})")
+_MONTHS = {m: i + 1 for i, m in enumerate(
+    (b"Jan", b"Feb", b"Mar", b"Apr", b"May", b"Jun", b"Jul", b"Aug", b"Sep", b"Oct", b"Nov", b"Dec"))}
+
+
+class MisraGries:
+    """Résumé « heavy hitters » : au plus ``capacity`` compteurs, fusionnable."""
+
+    def __init__(self, capacity: int = SKETCH_CAPACITY, counts: Optional[Dict[str, int]] = None):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = dict(counts or {})
+
+    def add(self, item: str, n: int = 1):
+        counts = self.counts
+        if item in counts or len(counts) < self.capacity:
+            counts[item] = counts.get(item, 0) + n
+            return
+        # plus de place : on décrémente tout le monde
+        for key in list(counts):
+            counts[key] -= 1
+            if counts[key] <= 0:
+                del counts[key]
+
+    def merge(self, other: "MisraGries"):
+        for key, n in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + n
+        if len(self.counts) > self.capacity:
+            cut = sorted(self.counts.values(), reverse=True)[self.capacity]
+            self.counts = {k: n - cut for k, n in self.counts.items() if n > cut}
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+
+
+@lru_cache(maxsize=32)
+def compile_rules(rules: Tuple[Tuple[str, str, bool], ...]):
+    """Compile les règles en une seule expression ``(?P<r0>...)|(?P<r1>...)``."""
+    combined = b"|".join(b"(?P<r%d>%s)" % (i, pattern.encode()) for i, (_, pattern, _) in enumerate(rules))
+    return re.compile(combined)
+
+
+def _timestamp(line: bytes) -> Optional[str]:
+    m = _ISO_TS_RE.match(line)
+    if m:
+        return (m.group(1) + b" " + m.group(2)).decode()
+    m = _SYSLOG_TS_RE.match(line)
+    if m and m.group(1) in _MONTHS:
+        # syslog n'a pas d'année : on garde MM-JJ pour que les tranches restent triables
+        return "%02d-%02d %s" % (_MONTHS[m.group(1)], int(m.group(2)), m.group(3).decode())
+    return None
+
+
+def new_result() -> dict:
+    return {
+        "total_lines": 0,
+        "matched_lines": 0,
+        "rule_counts": {},
+        "histogram": {},
+        "ips": MisraGries(),
+        "users": MisraGries(),
+        "examples": [],
+    }
+
+
+def analyze_lines(lines: Iterable[bytes], rules, bucket: str = "hour", result: Optional[dict] = None) -> dict:
+    """Analyse un flux de lignes (bytes, sans ``\\n``) et complète ``result``."""
+    result = result if result is not None else new_result()
+    matcher = compile_rules(rules)
+    names = [name for name, _, _ in rules]
+    failure = [is_failure for _, _, is_failure in rules]
+    rule_counts = result["rule_counts"]
+    histogram = result["histogram"]
+    ips, users, examples = result["ips"], result["users"], result["examples"]
+    # les horodatages syslog ("MM-JJ HH:MM:SS") n'ont pas les 5 caractères "AAAA-"
+    cut = BUCKETS[bucket]
+    total = matched = 0
+    for line in lines:
+        total += 1
+        m = matcher.search(line)
+        if m is None:
+            continue
+        matched += 1
+        i = int(m.lastgroup[1:])
+        name = names[i]
+        rule_counts[name] = rule_counts.get(name, 0) + 1
+        if len(examples) < MAX_EXAMPLES:
+            examples.append({"rule": name, "line": line.decode("utf-8", errors="ignore")})
+        if not failure[i]:
+            continue
+        ip = _IP_RE.search(line)
+        if ip:
+            ips.add(ip.group(1).decode())
+        user = _USER_RE.search(line)
+        if user:
+            users.add(user.group(1).decode("utf-8", errors="ignore"))
+        ts = _timestamp(line)
+        if ts:
+            key = ts[:cut] if len(ts) == 19 else ts[:cut - 5]
+            histogram[key] = histogram.get(key, 0) + 1
+    result["total_lines"] += total
+    result["matched_lines"] += matched
+    return result
+
+
+def merge_results(parts: List[dict]) -> dict:
+    out = new_result()
+    for part in parts:
+        out["total_lines"] += part["total_lines"]
+        out["matched_lines"] += part["matched_lines"]
+        for key in ("rule_counts", "histogram"):
+            for k, n in part[key].items():
+                out[key][k] = out[key].get(k, 0) + n
+        out["ips"].merge(part["ips"])
+        out["users"].merge(part["users"])
+        out["examples"].extend(part["examples"][:MAX_EXAMPLES - len(out["examples"])])
+    return out
+
+
+def summarize(result: dict, top_k: int = 10) -> dict:
+    """Forme JSON du résultat (les compteurs top-k sont des bornes inférieures)."""
+    return {
+        "total_lines": result["total_lines"],
+        "matched_lines": result["matched_lines"],
+        "rule_counts": result["rule_counts"],
+        "histogram": dict(sorted(result["histogram"].items())),
+        "failures_by_ip": [{"ip": ip, "count": n} for ip, n in result["ips"].top(top_k)],
+        "top_users": [{"user": u, "count": n} for u, n in result["users"].top(top_k)],
+        "examples": result["examples"],
+    }
+
+
+# --- Découpage d'un fichier en tranches pour le traitement parallèle ---
+
+def _iter_range(path: str, start: int, end: int):
+    """Lignes dont le premier octet est dans [start, end)."""
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            yield line.rstrip(b"\r\n")
+
+
+def analyze_range(path: str, start: int, end: int, rules, bucket: str) -> dict:
+    return analyze_lines(_iter_range(path, start, end), rules, bucket)
+
+
+def analyze_file(path: str, rules, bucket: str = "hour", workers: int = 1,
+                 pool: Optional[ProcessPoolExecutor] = None) -> dict:
+    """Analyse un fichier, en ``workers`` tranches parallèles si un pool est fourni."""
+    size = os.path.getsize(path)
+    if pool is None or workers <= 1:
+        return analyze_range(path, 0, size, rules, bucket)
+    step = -(-size // workers)
+    bounds = [(i, min(i + step, size)) for i in range(0, size, step)]
+    futures = [pool.submit(analyze_range, path, s, e, rules, bucket) for s, e in bounds]
+    return merge_results([f.result() for f in futures])
@@ -1,22 +1,52 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
-# LIGNE 1 : Avant, vous aviez 'from app.api import auth, modules, labs, ctf, simulation, audit, utils'
-# J'ai retiré 'simulation' de la liste car c'est le nom qui cause l'erreur (le fichier est manquant).
-from app.api import auth, modules, labs, ctf, audit, utils 
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware, registry
+from app import database
+# Le module du simulateur s'appelle 'simulator' (et non 'simulation', qui n'existe pas).
+from app.api import auth, modules, labs, ctf, audit, utils, simulator
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Démarrage / arrêt de l'application."""
+    await database.init_db()
+    # Métriques partagées entre workers (si PROMETHEUS_MULTIPROC_DIR est défini)
+    registry.start_dumping()
+    # Workers de déploiement des labs (+ pool d'instances pré-démarrées)
+    await labs.scheduler.start()
+    yield
+    await labs.scheduler.stop()
+    await database.close_db()
+    # Ferme le registre des résolutions et compacte le journal du store CTF
+    ctf.ledger.close()
+    ctf.store.close()
+    # Écrit les dernières lignes d'audit en attente
+    audit.writer.close()
+    # Arrête les processus d'analyse des journaux
+    utils.shutdown_pool()
 
 # Initialisation de l'application FastAPI
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
+# Compression gzip / brotli des réponses volumineuses
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
+# Latence / débit / erreurs par route (exposés sur /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # Inclusion des Routeurs
 app.include_router(auth.router, prefix=settings.API_V1_STR, tags=["Authentication"])
 app.include_router(modules.router, prefix=settings.API_V1_STR, tags=["Modules"])
 app.include_router(labs.router, prefix=settings.API_V1_STR, tags=["Labs"])
 app.include_router(ctf.router, prefix=settings.API_V1_STR, tags=["CTF"])
-# LIGNE 2 : J'ai mis en commentaire l'enregistrement du routeur 'simulation' pour éviter l'erreur.
-# app.include_router(simulation.router, prefix=settings.API_V1_STR, tags=["Simulation"]) 
+app.include_router(simulator.router, prefix=settings.API_V1_STR, tags=["Simulation"])
 app.include_router(audit.router, prefix=settings.API_V1_STR, tags=["Audit"])
 app.include_router(utils.router, prefix=settings.API_V1_STR, tags=["Utilities"])
 
@@ -25,4 +55,9 @@ def read_root():
     """Point de contrôle de santé de base."""
     return {"message": "Bienvenue dans l'API Backend de Kali-lite"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Métriques au format texte Prometheus."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Ajoutez d'autres middlewares ou gestionnaires d'événements ici si nécessaire
\ No newline at end of file
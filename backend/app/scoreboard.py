@@ -0,0 +1,181 @@
+"""
+Classement CTF maintenu de façon incrémentale.
+
+Le classement est une liste triée de clés ``(-score, dernière résolution,
+utilisateur)`` découpée en blocs d'au plus ``2 * load`` clés (comme
+``sortedcontainers.SortedList``) : chaque mise à jour retire puis réinsère
+une seule clé en O(log n + load), au lieu de décaler toute la liste. La
+position d'une clé additionne la taille des blocs qui la précèdent, soit
+O(n / load) opérations ``len`` faites en C.
+Les changements de rang sont diffusés aux clients abonnés (SSE) via une
+file asyncio bornée par client.
+"""
+import asyncio
+import bisect
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+_Key = Tuple[int, float, str]
+
+
+class _SortedKeys:
+    """Liste triée par blocs ; ``add``, ``remove`` et ``index`` renvoient la position (0 = premier)."""
+
+    def __init__(self, load: int = 512):
+        self._load = load
+        self._blocks: List[List[_Key]] = []
+        self._maxes: List[_Key] = []  # dernière clé de chaque bloc
+        self._len = 0
+
+    def _offset(self, b: int) -> int:
+        return sum(map(len, self._blocks[:b]))
+
+    def add(self, key: _Key) -> int:
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            return 0
+        b = bisect.bisect_left(self._maxes, key)
+        if b == len(self._maxes):
+            b -= 1
+            self._maxes[b] = key
+        block = self._blocks[b]
+        i = bisect.bisect_left(block, key)
+        block.insert(i, key)
+        pos = self._offset(b) + i
+        if len(block) > 2 * self._load:
+            # scission : les blocs restent courts, donc les insertions bon marché
+            self._blocks.insert(b + 1, block[self._load:])
+            del block[self._load:]
+            self._maxes.insert(b, block[-1])
+        return pos
+
+    def remove(self, key: _Key) -> int:
+        b = bisect.bisect_left(self._maxes, key)
+        block = self._blocks[b]
+        i = bisect.bisect_left(block, key)
+        pos = self._offset(b) + i
+        del block[i]
+        self._len -= 1
+        if not block:
+            del self._blocks[b]
+            del self._maxes[b]
+        else:
+            self._maxes[b] = block[-1]
+        return pos
+
+    def index(self, key: _Key) -> int:
+        b = bisect.bisect_left(self._maxes, key)
+        if b == len(self._maxes):
+            return self._len
+        return self._offset(b) + bisect.bisect_left(self._blocks[b], key)
+
+    def head(self, n: int) -> List[_Key]:
+        out: List[_Key] = []
+        for block in self._blocks:
+            if len(out) >= n:
+                break
+            out.extend(block[:n - len(out)])
+        return out
+
+    def __len__(self) -> int:
+        return self._len
+
+
+class Scoreboard:
+    def __init__(self, load: int = 512):
+        self._lock = threading.Lock()
+        self._scores: Dict[str, Tuple[int, float]] = {}
+        self._ranking = _SortedKeys(load)
+
+    @staticmethod
+    def _key(user: str, score: int, ts: float) -> Tuple[int, float, str]:
+        # score décroissant, puis le premier arrivé à ce score passe devant
+        return (-score, ts, user)
+
+    def add(self, user: str, points: int, ts: float) -> dict:
+        """Ajoute des points à un utilisateur et retourne son changement de rang."""
+        return self._update(user, points, ts)
+
+    def adjust(self, user: str, delta: int) -> Optional[dict]:
+        """Corrige un score (barème d'un défi modifié) sans changer l'heure de dernière résolution."""
+        return self._update(user, delta, None)
+
+    def _update(self, user: str, points: int, ts: Optional[float]) -> Optional[dict]:
+        with self._lock:
+            previous_rank = None
+            score = 0
+            last_ts = ts
+            if ts is None and user not in self._scores:
+                return None
+            if user in self._scores:
+                score, last_ts = self._scores[user]
+                previous_rank = self._ranking.remove(self._key(user, score, last_ts)) + 1
+            if ts is not None:
+                # les résolutions des autres workers peuvent arriver dans le désordre
+                last_ts = ts if last_ts is None else max(last_ts, ts)
+            score += points
+            new_key = self._key(user, score, last_ts)
+            self._scores[user] = (score, last_ts)
+            i = self._ranking.add(new_key)
+            return {"user": user, "score": score, "rank": i + 1, "previous_rank": previous_rank}
+
+    def rank(self, user: str) -> Optional[int]:
+        with self._lock:
+            if user not in self._scores:
+                return None
+            score, ts = self._scores[user]
+            return self._ranking.index(self._key(user, score, ts)) + 1
+
+    def top(self, n: int = 10) -> List[dict]:
+        with self._lock:
+            head = self._ranking.head(n)
+        return [{"rank": i + 1, "user": user, "score": -neg} for i, (neg, _, user) in enumerate(head)]
+
+    def __len__(self) -> int:
+        return len(self._ranking)
+
+
+class Broadcaster:
+    """
+    Diffuse des événements à de nombreux abonnés asyncio.
+
+    ``publish`` peut être appelé depuis n'importe quel thread (les endpoints
+    synchrones tournent dans le threadpool). Un client trop lent perd ses
+    événements les plus anciens plutôt que de ralentir les autres.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), q))
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        with self._lock:
+            self._subscribers = {(loop, sub) for loop, sub in self._subscribers if sub is not q}
+
+    @staticmethod
+    def _offer(q: asyncio.Queue, event: dict):
+        if q.full():
+            q.get_nowait()
+        q.put_nowait(event)
+
+    def publish(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, q in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, q, event)
+            except RuntimeError:
+                # boucle fermée : l'abonné a disparu
+                self.unsubscribe(q)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
@@ -0,0 +1,58 @@
+"""
+Catalogue port/protocole -> service pour le simulateur de scan.
+
+Chargé une seule fois à l'import depuis ``resources/nmap-services`` (même
+format que le fichier ``nmap-services`` de nmap). En plus du dictionnaire,
+des tableaux NumPy indexés par numéro de port (0..65535) permettent au mode
+« bulk » de résoudre les seuils d'ouverture de milliers de ports d'un coup.
+"""
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+CATALOG_FILE = os.path.join(os.path.dirname(__file__), "resources", "nmap-services")
+
+# Seuils sur le tirage déterministe (0..9) : tirage < seuil => port ouvert.
+# Les services courants sont souvent ouverts, les ports inconnus presque jamais.
+OPEN_THRESHOLDS = ((0.1, 5), (0.01, 3), (0.0, 1))
+UNLISTED_OPEN_THRESHOLD = 0
+
+
+def _load(path: str) -> Dict[Tuple[int, str], Tuple[str, float]]:
+    catalog = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            name, port_proto, freq = line.split()[:3]
+            port, proto = port_proto.split("/")
+            catalog[(int(port), proto)] = (name, float(freq))
+    return catalog
+
+
+def _open_threshold(freq: float) -> int:
+    for min_freq, threshold in OPEN_THRESHOLDS:
+        if freq >= min_freq:
+            return threshold
+    return UNLISTED_OPEN_THRESHOLD
+
+
+SERVICES = _load(CATALOG_FILE)
+
+# Vues TCP indexées par port
+TCP_OPEN_THRESHOLD = np.full(65536, UNLISTED_OPEN_THRESHOLD, dtype=np.int64)
+for (_port, _proto), (_name, _freq) in SERVICES.items():
+    if _proto == "tcp":
+        TCP_OPEN_THRESHOLD[_port] = _open_threshold(_freq)
+
+
+def service_name(port: int, proto: str = "tcp") -> Optional[str]:
+    entry = SERVICES.get((port, proto))
+    return entry[0] if entry else None
+
+
+def open_threshold(port: int, proto: str = "tcp") -> int:
+    entry = SERVICES.get((port, proto))
+    return _open_threshold(entry[1]) if entry else UNLISTED_OPEN_THRESHOLD
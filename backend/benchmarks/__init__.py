@@ -0,0 +1,16 @@
+"""
+Banc d'essai de l'API (débit et latences p50/p95/p99).
+
+Exécution depuis le dossier ``backend`` (dépendances : ``pip install -r requirements-dev.txt``) :
+
+    python -m benchmarks                      # application en mémoire (ASGI)
+    python -m benchmarks --mode uvicorn       # serveur uvicorn local
+    python -m benchmarks --url http://host:8000
+    python -m benchmarks --only ctf_list,check_flag --quick
+    python -m benchmarks --save benchmarks/baselines/avant.json
+    python -m benchmarks --compare benchmarks/baselines/avant.json
+
+En mode « en mémoire » et « uvicorn », les données (store CTF, audit,
+utilisateurs SQLite) sont écrites dans un dossier temporaire : les
+fichiers de ``app/`` ne sont pas touchés.
+"""
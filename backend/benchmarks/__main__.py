@@ -0,0 +1,164 @@
+"""Point d'entrée : ``python -m benchmarks --help``."""
+import argparse
+import asyncio
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from . import harness
+from .scenarios import SCENARIOS
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks", description="Banc d'essai de l'API Kali-lite.")
+    p.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess",
+                   help="application en mémoire (ASGI) ou serveur uvicorn local")
+    p.add_argument("--url", help="serveur déjà lancé (ignore --mode) ; les scénarios y créent des données")
+    p.add_argument("--only", default=",".join(SCENARIOS), help=f"scénarios séparés par des virgules : {','.join(SCENARIOS)}")
+    p.add_argument("--quick", action="store_true", help="tailles réduites (vérification rapide)")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--requests", type=int, default=2000, help="requêtes par scénario « léger »")
+    p.add_argument("--users", type=int, default=20)
+    p.add_argument("--login-requests", type=int, default=200)
+    p.add_argument("--levels", type=_int_list, default=[1, 16, 64], help="concurrences testées pour check-flag")
+    p.add_argument("--store-sizes", type=_int_list, default=[100, 1000, 5000])
+    p.add_argument("--list-requests", type=int, default=200)
+    p.add_argument("--log-mb", type=int, default=256, help="taille du journal généré pour /parse-logs")
+    p.add_argument("--log-runs", type=int, default=3)
+    p.add_argument("--bulk-targets", default="10.0.0.0/16")
+    p.add_argument("--bulk-ports", default="1-1024")
+    p.add_argument("--bulk-runs", type=int, default=3)
+    p.add_argument("--rate-limits", action="store_true",
+                   help="garde la limitation de débit (désactivée par défaut : tout vient d'une seule IP)")
+    p.add_argument("--save", metavar="FICHIER", help="enregistre les résultats (JSON)")
+    p.add_argument("--compare", metavar="FICHIER", help="compare à une référence enregistrée")
+    p.add_argument("--tolerance", type=float, default=0.10, help="écart toléré avant de signaler une régression")
+    opts = p.parse_args(argv)
+    if opts.quick:
+        opts.requests = min(opts.requests, 200)
+        opts.users = min(opts.users, 4)
+        opts.login_requests = min(opts.login_requests, 20)
+        opts.levels = [1, 16]
+        opts.store_sizes = [100, 1000]
+        opts.list_requests = min(opts.list_requests, 50)
+        opts.log_mb = min(opts.log_mb, 16)
+        opts.log_runs = 1
+        opts.bulk_targets = "10.0.0.0/22"
+        opts.bulk_runs = 1
+    unknown = set(opts.only.split(",")) - set(SCENARIOS)
+    if unknown:
+        p.error(f"scénarios inconnus : {', '.join(sorted(unknown))}")
+    return opts
+
+
+def _isolated_env(data_dir: str, rate_limits: bool) -> dict:
+    """Variables d'environnement pointant toutes les données de l'API vers ``data_dir``."""
+    return {
+        "DATA_DIR": data_dir,
+        "SQLITE_PATH": os.path.join(data_dir, "users.sqlite3"),
+        "DATABASE_BACKEND": "sqlite",
+        "RATE_LIMIT_ENABLED": "true" if rate_limits else "false",
+    }
+
+
+@contextlib.asynccontextmanager
+async def inprocess_client(data_dir: str, rate_limits: bool):
+    os.environ.update(_isolated_env(data_dir, rate_limits))
+    from app.main import app  # importé après la configuration de l'environnement
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            yield client
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def uvicorn_client(data_dir: str, rate_limits: bool):
+    port = _free_port()
+    env = {**os.environ, **_isolated_env(data_dir, rate_limits)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=None,
+                                     limits=httpx.Limits(max_connections=256)) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    if proc.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("uvicorn n'a pas démarré")
+                    await asyncio.sleep(0.2)
+            yield client
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+@contextlib.asynccontextmanager
+async def remote_client(url: str):
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=httpx.Limits(max_connections=256)) as client:
+        yield client
+
+
+async def run(opts) -> list:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="kali-bench-data-") as data_dir:
+        if opts.url:
+            factory = remote_client(opts.url)
+        elif opts.mode == "uvicorn":
+            factory = uvicorn_client(data_dir, opts.rate_limits)
+        else:
+            factory = inprocess_client(data_dir, opts.rate_limits)
+        async with factory as client:
+            for name in opts.only.split(","):
+                print(f"... {name}", file=sys.stderr, flush=True)
+                results.extend(await SCENARIOS[name](client, opts))
+    return results
+
+
+def main(argv=None) -> int:
+    opts = parse_args(argv)
+    mode = "remote" if opts.url else opts.mode
+    results = asyncio.run(run(opts))
+    print(harness.format_table(results))
+    if opts.save:
+        harness.save_baseline(opts.save, harness.environment(mode), results)
+        print(f"\nrésultats enregistrés dans {opts.save}")
+    if opts.compare:
+        baseline = harness.load_baseline(opts.compare)
+        lines, regressions = harness.compare({r.name: r.to_dict() for r in results}, baseline["results"],
+                                             opts.tolerance)
+        print(f"\ncomparaison avec {opts.compare} ({baseline['meta'].get('commit')}, {baseline['meta'].get('mode')})")
+        if baseline["meta"].get("mode") != mode:
+            print(f"attention : référence mesurée en mode {baseline['meta'].get('mode')}, exécution en mode {mode}")
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{regressions} régression(s) au-delà de {opts.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
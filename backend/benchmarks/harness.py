@@ -0,0 +1,142 @@
+"""
+Outils communs : exécution concurrente, percentiles, lignes de référence.
+
+Un ``Result`` résume une série de requêtes (débit, p50/p95/p99...). Les
+résultats sont enregistrés en JSON pour être comparés d'une exécution à
+l'autre : ``compare`` signale une régression quand le p95 augmente ou que
+le débit baisse de plus que la tolérance.
+"""
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentile par rang le plus proche (``sorted_values`` déjà trié)."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class Result:
+    def __init__(self, name: str, latencies: List[float], elapsed: float, errors: int = 0,
+                 extra: Optional[dict] = None):
+        self.name = name
+        self.latencies = sorted(latencies)
+        self.elapsed = elapsed
+        self.errors = errors
+        self.extra = extra or {}
+
+    def to_dict(self) -> dict:
+        lat = self.latencies
+        n = len(lat)
+        return {
+            "requests": n,
+            "errors": self.errors,
+            "duration_s": round(self.elapsed, 4),
+            "throughput_rps": round(n / self.elapsed, 2) if self.elapsed else 0.0,
+            "mean_ms": round(sum(lat) / n * 1000, 3) if n else 0.0,
+            "p50_ms": round(percentile(lat, 50) * 1000, 3),
+            "p95_ms": round(percentile(lat, 95) * 1000, 3),
+            "p99_ms": round(percentile(lat, 99) * 1000, 3),
+            "max_ms": round(lat[-1] * 1000, 3) if n else 0.0,
+            **self.extra,
+        }
+
+
+async def run_load(name: str, request: Callable[[int], Awaitable[bool]], total: int,
+                   concurrency: int, **extra) -> Result:
+    """
+    Exécute ``request(i)`` pour i dans [0, total) avec ``concurrency``
+    clients simultanés. ``request`` renvoie False (ou lève) en cas d'échec.
+    """
+    latencies: List[float] = []
+    errors = 0
+    indices = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for i in indices:
+            t0 = time.perf_counter()
+            try:
+                ok = await request(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - t0)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(max(1, min(concurrency, total)))))
+    return Result(name, latencies, time.perf_counter() - start, errors, {"concurrency": concurrency, **extra})
+
+
+# --- Lignes de référence ---
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def environment(mode: str) -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "mode": mode,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save_baseline(path: str, meta: dict, results: List[Result]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    payload = {"meta": meta, "results": {r.name: r.to_dict() for r in results}}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict],
+            tolerance: float) -> Tuple[List[str], int]:
+    """Lignes de rapport et nombre de régressions (p95 plus lent / débit plus faible)."""
+    lines = [f"{'scénario':<28} {'p95 réf':>10} {'p95':>10} {'Δ':>8}   {'rps réf':>10} {'rps':>10} {'Δ':>8}"]
+    regressions = 0
+    for name, cur in current.items():
+        ref = baseline.get(name)
+        if ref is None:
+            lines.append(f"{name:<28} (absent de la référence)")
+            continue
+        d_p95 = (cur["p95_ms"] - ref["p95_ms"]) / ref["p95_ms"] if ref["p95_ms"] else 0.0
+        d_rps = (cur["throughput_rps"] - ref["throughput_rps"]) / ref["throughput_rps"] if ref["throughput_rps"] else 0.0
+        flag = ""
+        if d_p95 > tolerance or d_rps < -tolerance:
+            regressions += 1
+            flag = "  RÉGRESSION"
+        lines.append(f"{name:<28} {ref['p95_ms']:>10.2f} {cur['p95_ms']:>10.2f} {d_p95:>+8.1%}   "
+                     f"{ref['throughput_rps']:>10.1f} {cur['throughput_rps']:>10.1f} {d_rps:>+8.1%}{flag}")
+    return lines, regressions
+
+
+def format_table(results: List[Result]) -> str:
+    lines = [f"{'scénario':<28} {'req':>6} {'err':>5} {'rps':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for r in results:
+        d = r.to_dict()
+        lines.append(f"{r.name:<28} {d['requests']:>6} {d['errors']:>5} {d['throughput_rps']:>10.1f} "
+                     f"{d['p50_ms']:>9.2f} {d['p95_ms']:>9.2f} {d['p99_ms']:>9.2f}")
+    return "\n".join(lines)
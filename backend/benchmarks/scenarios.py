@@ -0,0 +1,223 @@
+"""
+Scénarios de charge. Chacun reçoit un ``httpx.AsyncClient`` déjà pointé sur
+l'API et les options de la ligne de commande, et renvoie une liste de
+``Result``. Ils ne passent que par HTTP : ils fonctionnent à l'identique en
+mémoire, via uvicorn ou contre un serveur distant.
+"""
+import os
+import random
+import tempfile
+import time
+import uuid
+from typing import List
+
+import httpx
+
+from .harness import Result, run_load
+
+API = "/api/v1"
+RUN_ID = uuid.uuid4().hex[:8]  # évite les collisions de noms d'une exécution à l'autre
+
+
+# --- Authentification ---
+
+async def login(client: httpx.AsyncClient, opts) -> List[Result]:
+    """Connexion (bcrypt) puis accès authentifié avec le jeton obtenu."""
+    users = [f"bench-{RUN_ID}-{i}" for i in range(opts.users)]
+    password = "bench-Password-1!"
+
+    async def register(i):
+        r = await client.post(f"{API}/auth/register", json={"username": users[i], "password": password})
+        return r.status_code == 200
+
+    results = [await run_load("auth_register", register, len(users), opts.concurrency)]
+
+    tokens = {}
+
+    async def do_login(i):
+        user = users[i % len(users)]
+        r = await client.post(f"{API}/auth/login", data={"username": user, "password": password})
+        if r.status_code == 200:
+            tokens[user] = r.json()["access_token"]
+        return r.status_code == 200
+
+    results.append(await run_load("auth_login", do_login, opts.login_requests, opts.concurrency))
+
+    async def me(i):
+        token = tokens[users[i % len(users)]]
+        r = await client.get(f"{API}/auth/users/me", headers={"Authorization": f"Bearer {token}"})
+        return r.status_code == 200
+
+    if tokens:
+        users = list(tokens)
+        results.append(await run_load("auth_users_me", me, opts.requests, opts.concurrency))
+    return results
+
+
+# --- CTF ---
+
+def _challenge(i: int) -> dict:
+    words = ("buffer", "overflow", "cipher", "pcap", "xss", "sqli", "stego", "jwt", "race", "heap")
+    rng = random.Random(i)
+    return {
+        "title": f"{rng.choice(words)}-{rng.choice(words)}-{i}",
+        "category": rng.choice(("web", "crypto", "forensics", "pwn", "misc", "reverse")),
+        "description": " ".join(rng.choice(words) for _ in range(40)),
+        "flag": f"FLAG{{bench-{RUN_ID}-{i}}}",
+        "points": rng.choice((50, 100, 200, 300, 500)),
+    }
+
+
+async def check_flag(client: httpx.AsyncClient, opts) -> List[Result]:
+    """Soumissions de flag (1 sur 4 correcte) à plusieurs niveaux de concurrence."""
+    ch = _challenge(0)
+    r = await client.post(f"{API}/create", json=ch)
+    r.raise_for_status()
+    cid = r.json()["id"]
+    results = []
+    for level in opts.levels:
+        async def submit(i, level=level):
+            flag = ch["flag"] if i % 4 == 0 else "FLAG{wrong}"
+            r = await client.post(f"{API}/check-flag",
+                                  json={"id": cid, "flag": flag, "user": f"bench-{RUN_ID}-c{level}-{i % 500}"})
+            return r.status_code == 200
+
+        results.append(await run_load(f"check_flag_c{level}", submit, opts.requests, level))
+    return results
+
+
+async def ctf_list(client: httpx.AsyncClient, opts) -> List[Result]:
+    """``/list`` pour des stores de taille croissante (remplis via ``/create``)."""
+    results = []
+    created = 0
+    for size in opts.store_sizes:
+        async def create(i, offset=created):
+            r = await client.post(f"{API}/create", json=_challenge(offset + i))
+            return r.status_code == 200
+
+        if size > created:
+            results.append(await run_load(f"ctf_create_to_{size}", create, size - created, opts.concurrency))
+            created = size
+
+        async def fetch(i):
+            r = await client.get(f"{API}/list")
+            return r.status_code == 200
+
+        res = await run_load(f"ctf_list_{size}", fetch, opts.list_requests, opts.concurrency)
+        r = await client.get(f"{API}/list")
+        res.extra.update({"challenges": len(r.json()), "response_bytes": len(r.content),
+                          "wire_bytes": int(r.headers.get("content-length", len(r.content)))})
+        results.append(res)
+
+        etag = r.headers.get("etag")
+        if etag:
+            async def revalidate(i):
+                r = await client.get(f"{API}/list", headers={"If-None-Match": etag})
+                return r.status_code == 304
+
+            results.append(await run_load(f"ctf_list_{size}_304", revalidate, opts.list_requests, opts.concurrency))
+
+        async def query(i):
+            params = {"category": ("web", "crypto", "pwn")[i % 3], "q": "over", "min_points": 100,
+                      "limit": 50, "fields": "id,title,points"}
+            r = await client.get(f"{API}/list", params=params)
+            return r.status_code == 200
+
+        results.append(await run_load(f"ctf_query_{size}", query, opts.list_requests, opts.concurrency))
+    return results
+
+
+# --- Journaux ---
+
+_LOG_LINES = (
+    "{ts} kali sshd[{pid}]: Failed password for root from 203.0.113.{a} port {port} ssh2",
+    "{ts} kali sshd[{pid}]: Failed password for invalid user admin{a} from 198.51.100.{a} port {port} ssh2",
+    "{ts} kali sshd[{pid}]: Accepted publickey for student from 192.0.2.{a} port {port} ssh2",
+    "{ts} kali sudo: pam_unix(sudo:auth): authentication failure; logname= uid=1000 user=student{a}",
+    "{ts} kali CRON[{pid}]: pam_unix(cron:session): session opened for user root by (uid=0)",
+    "{ts} kali kernel: [UFW BLOCK] IN=eth0 OUT= SRC=203.0.113.{a} DST=10.0.0.5 PROTO=TCP DPT={port}",
+    "{ts} kali app[{pid}]: FAILED LOGIN user=ctf{a} from 198.51.100.{a}",
+    "{ts} kali systemd[1]: Started Session {pid} of user kali.",
+)
+
+
+def generate_log(path: str, size_mb: int, seed: int = 0) -> int:
+    """Écrit un journal « auth.log » synthétique d'environ ``size_mb`` Mio, renvoie sa taille."""
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    base = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+    with open(path, "w", encoding="utf-8") as f:
+        n = 0
+        while written < target:
+            # un bloc d'environ 1 Mio par écriture
+            lines = []
+            for _ in range(8192):
+                ts = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(base + n))
+                lines.append(rng.choice(_LOG_LINES).format(
+                    ts=ts, pid=rng.randint(100, 65000), a=rng.randint(1, 254), port=rng.randint(1024, 65535)))
+                n += 1
+            block = "\n".join(lines) + "\n"
+            f.write(block)
+            written += len(block)
+    return written
+
+
+async def logs(client: httpx.AsyncClient, opts) -> List[Result]:
+    """Envoi d'un gros journal à ``/parse-logs`` puis à ``/analyze-logs``."""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="kali-bench-") as tmp:
+        path = os.path.join(tmp, "auth.log")
+        size = generate_log(path, opts.log_mb)
+        for endpoint in ("parse-logs", "analyze-logs"):
+            async def upload(i, endpoint=endpoint):
+                with open(path, "rb") as f:
+                    r = await client.post(f"{API}/{endpoint}", files={"file": ("auth.log", f, "text/plain")})
+                return r.status_code == 200
+
+            res = await run_load(endpoint.replace("-", "_"), upload, opts.log_runs, 1)
+            mean = sum(res.latencies) / len(res.latencies) if res.latencies else 0
+            res.extra.update({"file_mb": round(size / 2**20, 1),
+                              "mb_per_s": round(size / 2**20 / mean, 1) if mean else 0.0})
+            results.append(res)
+    return results
+
+
+# --- Simulateur de scan ---
+
+async def simulate_scan(client: httpx.AsyncClient, opts) -> List[Result]:
+    """Scan simulé unitaire puis balayage « bulk » en NDJSON."""
+    ports = list(range(1, 101))
+
+    async def single(i):
+        r = await client.post(f"{API}/simulate-scan", json={"target": f"10.0.{i % 256}.{i % 250 + 1}", "ports": ports})
+        return r.status_code == 200
+
+    results = [await run_load("simulate_scan", single, opts.requests, opts.concurrency)]
+
+    body_bytes = 0
+    lines = 0
+
+    async def bulk(i):
+        nonlocal body_bytes, lines
+        r = await client.post(f"{API}/simulate-scan/bulk",
+                              json={"targets": [opts.bulk_targets], "ports": opts.bulk_ports})
+        body_bytes = len(r.content)
+        lines = r.content.count(b"\n")
+        return r.status_code == 200
+
+    res = await run_load("simulate_scan_bulk", bulk, opts.bulk_runs, 1)
+    mean = sum(res.latencies) / len(res.latencies) if res.latencies else 0
+    res.extra.update({"targets": opts.bulk_targets, "ports": opts.bulk_ports, "response_bytes": body_bytes,
+                      "targets_per_s": round((lines - 1) / mean, 1) if mean else 0.0})
+    results.append(res)
+    return results
+
+
+SCENARIOS = {
+    "login": login,
+    "check_flag": check_flag,
+    "ctf_list": ctf_list,
+    "logs": logs,
+    "simulate_scan": simulate_scan,
+}
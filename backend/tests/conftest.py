@@ -0,0 +1,33 @@
+"""
+Configuration commune : les modules ``app.api.*`` ouvrent leurs fichiers
+(store CTF, journal d'audit, base SQLite) à l'import, on les dirige donc
+vers un répertoire temporaire avant tout import de ``app``.
+"""
+import os
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="kali-tests-")
+os.environ.setdefault("DATA_DIR", _DATA_DIR)
+os.environ.setdefault("SQLITE_PATH", os.path.join(_DATA_DIR, "users.sqlite3"))
+os.environ.setdefault("ADMIN_USERS", '["admin"]')
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    from app.api.auth import create_access_token
+
+    client.post("/api/v1/auth/register", json={"username": "admin", "password": "admin-password"})
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
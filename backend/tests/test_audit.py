@@ -0,0 +1,168 @@
+"""
+Journal d'audit : écriture par lots depuis plusieurs processus, rotation et
+compression des segments.
+"""
+import glob
+import gzip
+import multiprocessing
+import os
+import time
+
+from app.audit_log import AuditWriter
+from app.core.filelock import file_lock
+
+
+def _write_records(path: str, writer_id: int, count: int):
+    writer = AuditWriter(path, batch_size=5, flush_interval=0.01, rotate_bytes=2000, rotate_daily=False)
+    for n in range(count):
+        ts = time.strftime("%Y-%m-%d %H:%M:%S")
+        writer.write(f"{ts} user=w{writer_id} action=test detail={n:04d}\n")
+        if n % 10 == 0:
+            time.sleep(0.005)
+    writer.close()
+
+
+def _read_all(path: str):
+    base, ext = os.path.splitext(path)
+    lines = []
+    for segment in glob.glob(f"{base}-*{ext}.gz"):
+        with gzip.open(segment, "rt", encoding="utf-8") as f:
+            lines += f.read().splitlines()
+    for segment in glob.glob(f"{base}-*{ext}") + [path]:
+        if os.path.exists(segment):
+            with open(segment, encoding="utf-8") as f:
+                lines += f.read().splitlines()
+    return lines
+
+
+def test_two_writers_lose_nothing_across_rotations(tmp_path):
+    path = str(tmp_path / "audit.log")
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_write_records, args=(path, i, 150)) for i in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+    lines = _read_all(path)
+    assert len(lines) == 300
+    assert len({line.split(" ", 2)[2] for line in lines}) == 300
+    # de nombreuses rotations, toutes compressées, sans temporaire oublié
+    assert len(glob.glob(str(tmp_path / "audit-*.log.gz"))) > 5
+    assert not glob.glob(str(tmp_path / "*.tmp")) and not glob.glob(str(tmp_path / "audit-*.log"))
+
+
+def test_flush_gives_up_when_the_queue_stays_full(tmp_path):
+    path = str(tmp_path / "audit.log")
+    writer = AuditWriter(path, queue_size=2, batch_size=1)
+    # un autre détenteur du verrou bloque le thread d'écriture
+    with file_lock(writer.lock_file):
+        for n in range(4):
+            writer.write(f"2026-01-01 00:00:0{n} line {n}\n")
+        start = time.monotonic()
+        assert writer.flush(timeout=0.2) is False
+        assert time.monotonic() - start < 1.0
+    assert writer.flush(timeout=5.0) is True
+    stats = writer.stats()
+    assert stats["written"] + stats["dropped"] == 4 and stats["dropped"] >= 1
+    writer.close()
+
+
+# --- Requêtes (index clairsemé, segments .gz, curseurs) ---
+
+def _ts(second: int) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.mktime((2026, 1, 1, 10, 0, 0, 0, 0, -1)) + second))
+
+
+def _write_lines(path: str, seconds):
+    with open(path, "a", encoding="utf-8") as f:
+        for n, second in enumerate(seconds):
+            f.write(f"{_ts(second)} user=u{n % 3} action=a{n % 2} detail=line-{second}-{n}\n")
+
+
+def _segment(tmp_path, second: int) -> str:
+    # nom d'un segment tourné à l'heure _ts(second)
+    stamp = _ts(second).replace("-", "").replace(":", "").replace(" ", "-")
+    return str(tmp_path / f"audit-{stamp}-000.log")
+
+
+def _all_pages(index, cursor=None, **kwargs):
+    items, pages = [], 0
+    while True:
+        page, cursor = index.query(cursor=cursor, **kwargs)
+        items += page
+        pages += 1
+        if cursor is None:
+            return items, pages
+
+
+def test_gzip_segments_are_read_from_the_indexed_block(tmp_path, monkeypatch):
+    from app import audit_query
+    from app.audit_query import AuditIndex, compress_segment
+
+    old = _segment(tmp_path, 1000)
+    _write_lines(old, range(1000))
+    compress_segment(old, block=500)
+    assert os.path.exists(old + ".gz.idx") and not os.path.exists(old)
+    _write_lines(str(tmp_path / "audit.log"), range(1000, 1100))
+
+    index = AuditIndex(str(tmp_path / "audit.log"), skew=0)
+    items, _ = index.query(_ts(700), _ts(709), limit=100)
+    assert [i["message"].rsplit("-", 2)[1] for i in items] == [str(s) for s in range(700, 710)]
+
+    # le flux décompressé commence près de la ligne 700, pas au début du fichier
+    read = []
+    real = audit_query.gzip.GzipFile
+
+    class Counting(real):
+        def __next__(self):
+            line = real.__next__(self)
+            read.append(line)
+            return line
+
+    monkeypatch.setattr(audit_query.gzip, "GzipFile", Counting)
+    index.query(_ts(700), _ts(709), limit=100)
+    assert 10 <= len(read) < 50
+
+
+def test_cursor_survives_compression_of_its_segment(tmp_path):
+    from app.audit_query import AuditIndex, compress_segment
+
+    old = _segment(tmp_path, 500)
+    _write_lines(old, range(500))
+    _write_lines(str(tmp_path / "audit.log"), range(500, 600))
+    index = AuditIndex(str(tmp_path / "audit.log"), stride=256, skew=0)
+    expected, _ = _all_pages(index, limit=1000)
+    assert len(expected) == 600
+
+    first, cursor = index.query(limit=120)
+    compress_segment(old, block=300)
+    # le curseur pointe dans l'ancien inode : la reprise se fait au même offset dans le .gz
+    rest, pages = _all_pages(index, cursor=cursor, limit=120)
+    assert first + rest == expected and pages == 4
+
+
+def test_filters_and_bad_cursor(tmp_path):
+    import pytest
+
+    from app.audit_query import AuditIndex
+
+    _write_lines(str(tmp_path / "audit.log"), range(300))
+    index = AuditIndex(str(tmp_path / "audit.log"), stride=128)
+    items, pages = _all_pages(index, user="u1", action="a0", limit=7)
+    assert len(items) == 50 and pages == 8
+    assert all(i["user"] == "u1" and i["action"] == "a0" for i in items)
+    with pytest.raises(ValueError):
+        index.query(cursor="bm90IGEgY3Vyc29y")
+
+
+def test_lines_written_late_by_another_worker_are_found(tmp_path):
+    from app.audit_query import AuditIndex
+
+    # le lot d'un second worker arrive après des lignes plus récentes
+    _write_lines(str(tmp_path / "audit.log"), list(range(100)) + [95, 96, 97] + list(range(100, 200)))
+    index = AuditIndex(str(tmp_path / "audit.log"), stride=64, skew=5)
+    items, _ = index.query(_ts(90), _ts(97), limit=100)
+    assert len(items) == 8 + 3
+    strict = AuditIndex(str(tmp_path / "audit.log"), stride=64, skew=0)
+    assert len(strict.query(_ts(90), _ts(97), limit=100)[0]) == 8
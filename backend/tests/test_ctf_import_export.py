@@ -0,0 +1,82 @@
+"""
+Import / export en masse des défis via l'API (NDJSON et archive zip).
+"""
+import io
+import json
+import uuid
+import zipfile
+
+API = "/api/v1"
+
+
+def _ndjson(records) -> bytes:
+    return "".join(json.dumps(r) + "\n" for r in records).encode("utf-8")
+
+
+def _record(cid: str, points: int = 100, flag: str = "FLAG{x}") -> dict:
+    return {"id": cid, "title": f"t-{cid}", "category": "web", "description": "d",
+            "points": points, "flag": flag}
+
+
+def _import(client, data: bytes, headers=None, **form):
+    files = {"file": ("bank.ndjson", data, "application/x-ndjson")}
+    return client.post(f"{API}/challenges/import", files=files, data=form, headers=headers or {})
+
+
+def _export(client, headers=None, **params):
+    resp = client.get(f"{API}/challenges/export", params=params, headers=headers or {})
+    assert resp.status_code == 200
+    return {r["id"]: r for r in map(json.loads, resp.content.splitlines())}
+
+
+def test_import_reports_bad_lines_and_skips_existing(client):
+    a, b = str(uuid.uuid4()), str(uuid.uuid4())
+    data = _ndjson([_record(a), {"id": "x", "title": "no flag", "category": "web", "description": ""}])
+    data += b"{not json\n" + _ndjson([_record(b), _record(a)])
+    out = _import(client, data).json()
+    assert out["imported"] == 2 and out["skipped"] == 1 and out["error_count"] == 2
+    assert [e["line"] for e in out["errors"]] == [2, 3]
+
+    ok = client.post(f"{API}/check-flag", json={"id": a, "flag": "FLAG{x}"}).json()
+    assert ok["result"] == "correct"
+
+
+def test_export_hides_flags_unless_admin(client, admin_headers):
+    cid = str(uuid.uuid4())
+    _import(client, _ndjson([_record(cid)]))
+    public = _export(client)[cid]
+    assert "flag_hash" not in public and "flag_salt" not in public
+
+    assert client.get(f"{API}/challenges/export", params={"include_flags": True}).status_code == 401
+    full = _export(client, headers=admin_headers, include_flags=True)[cid]
+    assert full["flag_hash"] and full["flag_salt"]
+
+
+def test_zip_roundtrip_keeps_flag_digests(client, admin_headers):
+    cid = str(uuid.uuid4())
+    _import(client, _ndjson([_record(cid, flag="FLAG{zip}")]))
+    resp = client.get(f"{API}/challenges/export", params={"format": "zip", "include_flags": True},
+                      headers=admin_headers)
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        assert json.loads(zf.read("manifest.json"))["flags"] is True
+
+    # réimport en remplacement : même empreinte, le flag d'origine reste valable
+    files = {"file": ("bank.zip", resp.content, "application/zip")}
+    out = client.post(f"{API}/challenges/import", files=files, data={"on_conflict": "replace"},
+                      headers=admin_headers).json()
+    assert out["error_count"] == 0 and out["imported"] >= 1
+    ok = client.post(f"{API}/check-flag", json={"id": cid, "flag": "FLAG{zip}"}).json()
+    assert ok["result"] == "correct"
+
+
+def test_replace_requires_admin_and_rescores_solvers(client, admin_headers):
+    cid, user = str(uuid.uuid4()), f"u-{uuid.uuid4().hex[:8]}"
+    _import(client, _ndjson([_record(cid, points=50)]))
+    client.post(f"{API}/check-flag", json={"id": cid, "flag": "FLAG{x}", "user": user})
+
+    data = _ndjson([_record(cid, points=80)])
+    assert _import(client, data, on_conflict="replace").status_code == 401
+    out = _import(client, data, headers=admin_headers, on_conflict="replace").json()
+    assert out["imported"] == 1
+    board = {row["user"]: row["score"] for row in client.get(f"{API}/scoreboard", params={"limit": 1000}).json()}
+    assert board[user] == 80
@@ -0,0 +1,158 @@
+"""
+Store CTF (snapshot + journal append-only) et registre des résolutions
+partagés par plusieurs processus, comme des workers uvicorn pointant sur le
+même ``DATA_DIR``.
+"""
+import json
+import multiprocessing
+import threading
+
+from app.ctf_store import CTFStore, SolveLedger
+
+
+def _challenge(n: int) -> dict:
+    return {"title": f"c{n}", "category": "web", "description": "", "points": n,
+            "flag_salt": "s", "flag_hash": "h"}
+
+
+def _put_range(path: str, start: int, count: int, compact_every: int):
+    store = CTFStore(path, compact_every=compact_every)
+    for n in range(start, start + count):
+        store.put(f"id-{n}", _challenge(n))
+    store.close()
+
+
+def _run_writers(path: str, writers: int, per_writer: int, compact_every: int):
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_put_range, args=(path, i * per_writer, per_writer, compact_every))
+             for i in range(writers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+
+def test_put_get_and_reload_from_log(tmp_path):
+    path = str(tmp_path / "ctf_store.json")
+    store = CTFStore(path)
+    store.put("a", _challenge(1))
+    store.put_many([("b", _challenge(2)), ("c", _challenge(3))])
+    assert store.get("b")["points"] == 2 and "c" in store and len(store) == 3
+
+    # sans close() : tout est relu depuis le journal
+    again = CTFStore(path)
+    assert [cid for cid, _ in again.items()] == ["a", "b", "c"]
+    assert again.query(min_points=2)[3] == 2
+
+
+def test_compaction_rewrites_snapshot_and_empties_log(tmp_path):
+    path = str(tmp_path / "ctf_store.json")
+    store = CTFStore(path, compact_every=5)
+    for n in range(12):
+        store.put(f"id-{n}", _challenge(n))
+    with open(path, encoding="utf-8") as f:
+        assert len(json.load(f)) == 10
+    with open(store.log_file, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+    store.close()
+    with open(path, encoding="utf-8") as f:
+        assert len(json.load(f)) == 12
+
+
+def test_other_process_writes_are_visible(tmp_path):
+    path = str(tmp_path / "ctf_store.json")
+    store = CTFStore(path)
+    version = store.version
+    _run_writers(path, writers=1, per_writer=20, compact_every=1000)
+    assert len(store) == 20 and store.get("id-7")["points"] == 7
+    assert store.version > version
+
+
+def test_concurrent_writers_and_compactions_lose_nothing(tmp_path):
+    path = str(tmp_path / "ctf_store.json")
+    store = CTFStore(path, compact_every=25)
+    _run_writers(path, writers=4, per_writer=100, compact_every=25)
+    # chaque processus a compacté plusieurs fois : ce processus recharge le snapshot
+    assert len(store) == 400
+    assert {cid for cid, _ in CTFStore(path).items()} == {f"id-{n}" for n in range(400)}
+
+
+def test_reads_are_throttled_but_missing_ids_force_a_check(tmp_path):
+    path = str(tmp_path / "ctf_store.json")
+    store = CTFStore(path, sync_interval=3600)
+    len(store)
+    _run_writers(path, writers=1, per_writer=3, compact_every=1000)
+    # journal examiné il y a moins de sync_interval : pas encore vu...
+    assert len(store) == 0
+    # ... sauf pour un identifiant inconnu
+    assert store.get("id-1")["points"] == 1 and len(store) == 3
+
+
+# --- Registre des résolutions ---
+
+def _record_all(log_file: str, users: int, challenges: int) -> int:
+    ledger = SolveLedger(log_file, sync_interval=0)
+    wins = sum(ledger.record(f"u{u}", f"c{c}", 1.0) for u in range(users) for c in range(challenges))
+    ledger.close()
+    return wins
+
+
+def test_double_solve_in_one_process_scores_once(tmp_path):
+    ledger = SolveLedger(str(tmp_path / "solves.log"))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ledger.record("alice", "c1", 1.0)))
+               for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [False] * 19 + [True]
+    assert ledger.record("alice", "c2", 2.0) and ledger.has_solved("alice", "c2")
+    ledger.close()
+    with open(tmp_path / "solves.log", encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+
+def test_double_solves_across_processes_score_once(tmp_path):
+    log_file = str(tmp_path / "solves.log")
+    ledger = SolveLedger(log_file, sync_interval=0)
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(4) as pool:
+        wins = pool.starmap(_record_all, [(log_file, 5, 8)] * 4)
+    # chaque (utilisateur, défi) soumis par les quatre processus n'est gagné qu'une fois
+    assert sum(wins) == 40
+    with open(log_file, encoding="utf-8") as f:
+        keys = [(r["user"], r["id"]) for r in map(json.loads, f)]
+    assert len(keys) == len(set(keys)) == 40
+    # et ce processus voit les résolutions des autres
+    assert ledger.has_solved("u4", "c7") and len(ledger.items()) == 40
+    assert not ledger.record("u0", "c0", 2.0)
+    ledger.close()
+
+
+def test_subscribers_see_replayed_and_other_process_solves(tmp_path):
+    log_file = str(tmp_path / "solves.log")
+    first = SolveLedger(log_file)
+    first.record("early", "c0", 0.5)
+    first.close()
+
+    ledger = SolveLedger(log_file, sync_interval=0, poll_interval=0.05)
+    seen = []
+    done = threading.Event()
+
+    def listener(user, cid, ts):
+        seen.append((user, cid))
+        if len(seen) == 1 + 2 * 3:
+            done.set()
+
+    ledger.subscribe(listener)
+    assert seen == [("early", "c0")]
+    ctx = multiprocessing.get_context("spawn")
+    p = ctx.Process(target=_record_all, args=(log_file, 2, 3))
+    p.start()
+    p.join(60)
+    # sans aucune lecture de ce côté : le thread du registre relit le journal
+    assert done.wait(10)
+    assert len(set(seen)) == len(seen)
+    ledger.close()
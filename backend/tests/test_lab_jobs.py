@@ -0,0 +1,277 @@
+"""
+Planificateur de labs avec un faux ``docker-compose`` : le script enregistre
+ses arguments (et ``LAB_HTTP_PORT``) dans un fichier JSONL, ses ``up``
+peuvent échouer un nombre de fois donné ou durer un temps donné.
+"""
+import asyncio
+import json
+import sys
+import textwrap
+
+import pytest
+
+from app.lab_jobs import LabScheduler, QueueFull
+
+FAKE_COMPOSE = textwrap.dedent("""
+    import json, os, sys, time
+    calls, failures, delay = sys.argv[1], sys.argv[2], sys.argv[3]
+    args = sys.argv[4:]
+    with open(calls, "a") as f:
+        f.write(json.dumps({"args": args, "port": os.environ.get("LAB_HTTP_PORT")}) + "\\n")
+    print("fake compose", " ".join(args))
+    if "up" in args and os.path.exists(delay):
+        time.sleep(float(open(delay).read()))
+    if "up" in args and os.path.exists(failures):
+        left = int(open(failures).read() or 0)
+        if left > 0:
+            open(failures, "w").write(str(left - 1))
+            sys.exit(1)
+""")
+
+COMPOSE_VARIABLE_PORT = 'services:\n  vulnerable-web:\n    ports:\n      - "${LAB_HTTP_PORT:-8081}:80"\n'
+COMPOSE_FIXED_PORT = 'services:\n  vulnerable-web:\n    ports:\n      - "8081:80"\n'
+
+
+@pytest.fixture
+def env(tmp_path):
+    fake = tmp_path / "fake_compose.py"
+    fake.write_text(FAKE_COMPOSE)
+    labs = tmp_path / "labs"
+    labs.mkdir()
+    (labs / "docker-compose.lab.yml").write_text(COMPOSE_VARIABLE_PORT)
+    calls = tmp_path / "calls.jsonl"
+    failures = tmp_path / "failures"
+    delay = tmp_path / "delay"
+
+    def make(**kwargs):
+        return LabScheduler([sys.executable, str(fake), str(calls), str(failures), str(delay)], str(labs), **kwargs)
+
+    def read_calls():
+        if not calls.exists():
+            return []
+        return [json.loads(line) for line in calls.read_text().splitlines()]
+
+    make.calls = read_calls
+    make.fail = lambda n: failures.write_text(str(n))
+    make.delay = lambda seconds: delay.write_text(str(seconds))
+    make.state_dir = str(tmp_path / "state")
+    make.labs = labs
+    return make
+
+
+async def _until(predicate, timeout=10.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_deploy_returns_job_and_runs_compose(env):
+    async def main():
+        scheduler = env()
+        await scheduler.start()
+        job = scheduler.submit("vulnerable-web")
+        assert job.status == "queued"
+        await asyncio.wait_for(job.done.wait(), 10)
+        await scheduler.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "deployed"
+    assert any("fake compose" in line for line in job.log)
+    assert env.calls()[0]["args"][-3:] == ["up", "-d", "vulnerable-web"]
+
+
+def test_concurrent_deploys_share_one_job(env):
+    async def main():
+        scheduler = env()
+        await scheduler.start()
+        jobs = {scheduler.submit("vulnerable-web").id for _ in range(30)}
+        await asyncio.wait_for(scheduler.jobs[jobs.pop()].done.wait(), 10)
+        await scheduler.stop()
+        return jobs
+
+    assert asyncio.run(main()) == set()
+    assert len(env.calls()) == 1
+
+
+def test_queue_full(env):
+    async def main():
+        scheduler = env(max_concurrent=1, queue_size=1)
+        await scheduler.start()
+        try:
+            # un job en cours au plus, un en attente : le troisième est refusé
+            with pytest.raises(QueueFull):
+                for lab in "abc":
+                    scheduler.submit(lab)
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_warm_pool_uses_distinct_ports_and_refills(env):
+    async def main():
+        scheduler = env(warm_pool_size=2, warm_port_base=20000)
+        await scheduler.start()
+        await _until(lambda: len(scheduler._ready) == 2)
+        job = scheduler.submit("vulnerable-web")
+        assert job.status == "deployed" and job.expires_at is not None
+        await _until(lambda: len(scheduler._ready) == 2)
+        ports = {j.port for j in scheduler._ready} | {job.port}
+        await scheduler.stop()
+        return ports
+
+    ports = asyncio.run(main())
+    assert len(ports) == 3 and min(ports) >= 20000
+    ups = [c for c in env.calls() if "up" in c["args"]]
+    assert len(ups) == 3
+    assert {int(c["port"]) for c in ups} == ports
+    # les deux instances restées dans le pool sont détruites à l'arrêt
+    assert sum("down" in c["args"] for c in env.calls()) == 2
+
+
+def test_failed_warm_start_is_retried_with_backoff(env):
+    env.fail(2)
+
+    async def main():
+        scheduler = env(warm_pool_size=1, retry_delay=0.05, retry_max_delay=0.2)
+        await scheduler.start()
+        await _until(lambda: len(scheduler._ready) == 1)
+        stats = scheduler.stats()
+        await scheduler.stop()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["warm_ready"] == 1 and stats["warm_starting"] == 0
+    ups = [c for c in env.calls() if "up" in c["args"]]
+    assert len(ups) == 3
+    # chaque échec nettoie son projet
+    projects = [c["args"][c["args"].index("-p") + 1] for c in env.calls() if "down" in c["args"]]
+    assert set(projects[:2]) == {ups[0]["args"][ups[0]["args"].index("-p") + 1],
+                                 ups[1]["args"][ups[1]["args"].index("-p") + 1]}
+
+
+def test_released_and_expired_instances_are_torn_down(env):
+    async def main():
+        scheduler = env(warm_pool_size=1, instance_ttl=0.2)
+        await scheduler.start()
+        await _until(lambda: len(scheduler._ready) == 1)
+        first = scheduler.submit("vulnerable-web")
+        down = scheduler.release(first.id)
+        assert scheduler.release(first.id) is None
+        await asyncio.wait_for(down.done.wait(), 10)
+        assert down.status == "removed" and first.port not in scheduler._ports
+
+        await _until(lambda: len(scheduler._ready) == 1)
+        second = scheduler.submit("vulnerable-web")
+        # non rendue : détruite à expiration
+        await _until(lambda: second.id not in scheduler._handed_out and second.port not in scheduler._ports)
+        await scheduler.stop()
+        return first, second
+
+    first, second = asyncio.run(main())
+    downs = [c for c in env.calls() if "down" in c["args"]]
+    projects = {c["args"][c["args"].index("-p") + 1] for c in downs}
+    assert {first.project, second.project} <= projects
+
+
+def test_fixed_host_port_disables_warm_pool(env):
+    (env.labs / "docker-compose.lab.yml").write_text(COMPOSE_FIXED_PORT)
+
+    async def main():
+        scheduler = env(warm_pool_size=2)
+        await scheduler.start()
+        await asyncio.sleep(0.1)
+        stats = scheduler.stats()
+        await scheduler.stop()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["warm_pool_error"] and stats["warm_ready"] == stats["warm_starting"] == 0
+    assert env.calls() == []
+
+
+def test_stop_cancels_queued_jobs(env):
+    env.delay(0.5)
+
+    async def main():
+        scheduler = env(max_concurrent=1)
+        await scheduler.start()
+        jobs = [scheduler.submit(lab) for lab in "abc"]
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return jobs
+
+    jobs = asyncio.run(main())
+    assert [j.status for j in jobs[1:]] == ["cancelled", "cancelled"]
+    assert all(j.done.is_set() and j.finished_at for j in jobs)
+
+
+# --- Plusieurs workers (deux planificateurs sur le même state_dir) ---
+
+def test_workers_share_job_status_and_dedupe(env):
+    env.delay(0.3)
+
+    async def main():
+        a, b = env(state_dir=env.state_dir), env(state_dir=env.state_dir)
+        await a.start()
+        await b.start()
+        job = a.submit("web")
+        # la même demande arrivée sur l'autre worker rejoint le job en cours
+        assert b.submit("web").id == job.id
+        assert b.get(job.id).status in ("queued", "running")
+        await asyncio.wait_for(job.done.wait(), 10)
+        seen = b.get(job.id)
+        again = b.submit("web")
+        await asyncio.wait_for(again.done.wait(), 10)
+        await a.stop()
+        await b.stop()
+        return job, seen, again
+
+    job, seen, again = asyncio.run(main())
+    assert seen.status == "deployed" and seen.log and again.id != job.id
+    assert len([c for c in env.calls() if "up" in c["args"]]) == 2
+
+
+def test_workers_get_distinct_port_ranges(env):
+    async def main():
+        a = env(state_dir=env.state_dir, warm_pool_size=2, warm_port_base=20000, port_range=10)
+        b = env(state_dir=env.state_dir, warm_pool_size=2, warm_port_base=20000, port_range=10)
+        await a.start()
+        await b.start()
+        await _until(lambda: len(a._ready) == len(b._ready) == 2)
+        ports = ({j.port for j in a._ready}, {j.port for j in b._ready})
+        slots = (a.port_slot, b.port_slot)
+        await a.stop()
+        await b.stop()
+        return ports, slots
+
+    (ports_a, ports_b), slots = asyncio.run(main())
+    assert sorted(slots) == [0, 1]
+    assert not ports_a & ports_b
+    assert all(20000 <= p < 20020 for p in ports_a | ports_b)
+
+
+def test_instance_released_through_another_worker(env):
+    async def main():
+        a = env(state_dir=env.state_dir, warm_pool_size=1, instance_ttl=0.3)
+        b = env(state_dir=env.state_dir)
+        await a.start()
+        await b.start()
+        await _until(lambda: len(a._ready) == 1)
+        job = a.submit("vulnerable-web")
+        down = b.release(job.id)
+        assert down is not None and a.release(job.id) is None
+        await asyncio.wait_for(down.done.wait(), 10)
+        # le propriétaire oublie l'instance au lieu de la détruire à expiration
+        await _until(lambda: job.id not in a._handed_out and job.port not in a._ports)
+        await asyncio.sleep(0.4)
+        await a.stop()
+        await b.stop()
+        return job, down
+
+    job, down = asyncio.run(main())
+    assert down.status == "removed"
+    downs = [c for c in env.calls() if "down" in c["args"] and job.project in c["args"]]
+    assert len(downs) == 1
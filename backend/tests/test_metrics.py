@@ -0,0 +1,56 @@
+"""
+Métriques : rendu au format texte et mode multi-processus
+(``PROMETHEUS_MULTIPROC_DIR``), avec un vrai second processus.
+"""
+import multiprocessing
+import os
+import time
+
+from app.core.metrics import Counter, Gauge, Histogram, Registry
+
+
+def _make(directory):
+    registry = Registry(directory, dump_interval=0.2)
+    requests = registry.register(Counter("t_requests_total", "Requêtes.", ("route",)))
+    in_flight = registry.register(Gauge("t_in_flight", "En cours."))
+    latency = registry.register(Histogram("t_latency_seconds", "Latence.", buckets=(0.1, 1.0)))
+    return registry, requests, in_flight, latency
+
+
+def _other_worker(directory):
+    registry, requests, in_flight, latency = _make(directory)
+    requests.inc("/a", amount=3)
+    requests.inc("/b")
+    in_flight.inc(amount=5)
+    latency.observe(0.05)
+    latency.observe(2.0)
+    registry.dump()
+
+
+def test_render_sums_values_from_all_workers(tmp_path):
+    directory = str(tmp_path)
+    registry, requests, in_flight, latency = _make(directory)
+    requests.inc("/a")
+    in_flight.inc()
+    latency.observe(0.5)
+    p = multiprocessing.get_context("spawn").Process(target=_other_worker, args=(directory,))
+    p.start()
+    p.join(60)
+    assert p.exitcode == 0
+
+    text = registry.render()
+    assert 't_requests_total{route="/a"} 4.0' in text
+    assert 't_requests_total{route="/b"} 1.0' in text
+    assert "t_in_flight 6.0" in text
+    assert 't_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{le="1.0"} 2' in text
+    assert 't_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "t_latency_seconds_count 3" in text
+
+    # worker arrêté : ses compteurs restent, ses jauges disparaissent
+    other = next(f for f in os.listdir(directory) if f != f"{os.getpid()}.json")
+    old = time.time() - 60
+    os.utime(os.path.join(directory, other), (old, old))
+    text = registry.render()
+    assert "t_in_flight 1.0" in text and 't_requests_total{route="/a"} 4.0' in text
+
@@ -0,0 +1,41 @@
+"""
+/parse-logs : lecture en flux, lignes très longues comprises.
+"""
+import pytest
+
+from app.api import utils
+
+API = "/api/v1"
+
+
+def _parse(client, data: bytes) -> dict:
+    resp = client.post(f"{API}/parse-logs", files={"file": ("auth.log", data, "text/plain")})
+    assert resp.status_code == 200
+    return resp.json()
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # petits morceaux : les motifs chevauchent des frontières de lecture
+    monkeypatch.setattr(utils, "CHUNK_SIZE", 7)
+    monkeypatch.setattr(utils, "MAX_LINE", 40)
+
+
+def test_counts_lines_and_failures(client):
+    out = _parse(client, b"ok\r\nFailed login for bob\r\nauth fail root\nlast line without newline")
+    assert out["total_lines"] == 4 and out["failed_attempts"] == 2
+    assert out["examples"] == ["Failed login for bob", "auth fail root"]
+
+
+def test_pattern_beyond_max_line_is_found(client):
+    line = b"x" * (utils.MAX_LINE * 3) + b" FAILED LOGIN"
+    out = _parse(client, line + b"\nok\n")
+    assert out["total_lines"] == 2 and out["failed_attempts"] == 1
+    assert len(out["examples"][0]) == utils.MAX_LINE
+
+
+@pytest.mark.parametrize("offset", range(0, 14))
+def test_pattern_split_across_reads(client, small_chunks, offset):
+    data = b"y" * (45 + offset) + b"auth FAIL\nx\n" + b"z" * offset + b"FAILED LOGIN\n"
+    out = _parse(client, data)
+    assert out["total_lines"] == 3 and out["failed_attempts"] == 2
@@ -0,0 +1,85 @@
+"""
+Limiteur de débit : seaux à jetons par clé, freinage des échecs par couple
+(IP, utilisateur), éviction des entrées.
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.core.ratelimit import RateLimited, RateLimiter
+
+
+def _limiter(**kwargs) -> RateLimiter:
+    # recharge négligeable pendant le test
+    options = dict(rate=1e-6, burst=2, ip_rate=1e-6, ip_burst=5)
+    options.update(kwargs)
+    return RateLimiter("test", **options)
+
+
+def test_burst_then_rate_limited_with_retry_after():
+    limiter = _limiter()
+    limiter.hit("user:alice")
+    limiter.hit("user:alice")
+    with pytest.raises(RateLimited) as e:
+        limiter.hit("user:alice")
+    assert e.value.reason == "rate" and e.value.retry_after > 0
+    with pytest.raises(HTTPException) as e:
+        limiter.check("user:alice")
+    assert e.value.status_code == 429 and int(e.value.headers["Retry-After"]) >= 1
+
+
+def test_ip_keys_have_their_own_larger_limits():
+    limiter = _limiter()
+    for n in range(5):
+        limiter.hit("ip:10.0.0.1", f"user:u{n}")
+    with pytest.raises(RateLimited):
+        limiter.hit("ip:10.0.0.1", "user:other")
+
+
+def test_rejected_request_spends_no_token():
+    limiter = _limiter()
+    limiter.hit("user:alice")
+    limiter.hit("user:alice")
+    # le refus sur la seconde clé ne consomme rien sur la première
+    for _ in range(10):
+        with pytest.raises(RateLimited):
+            limiter.hit("ip:10.0.0.1", "user:alice")
+    for n in range(5):
+        limiter.hit("ip:10.0.0.1", f"user:u{n}")
+
+
+def test_failures_back_off_per_ip_and_user_only():
+    limiter = _limiter(rate=100, burst=100, ip_rate=100, ip_burst=100, free_failures=2, base_delay=10)
+    attacker = "ip-user:10.0.0.1|alice"
+    limiter.failure(attacker, "user:alice", "ip:10.0.0.1")
+    limiter.hit("ip:10.0.0.1", "user:alice", attacker)
+    limiter.failure(attacker, "user:alice", "ip:10.0.0.1")
+    with pytest.raises(RateLimited) as e:
+        limiter.hit("ip:10.0.0.1", "user:alice", attacker)
+    assert e.value.reason == "failures" and 9 < e.value.retry_after <= 10
+
+    # le compte reste utilisable depuis une autre IP, l'IP pour d'autres comptes
+    limiter.hit("ip:10.0.0.2", "user:alice", "ip-user:10.0.0.2|alice")
+    limiter.hit("ip:10.0.0.1", "user:bob", "ip-user:10.0.0.1|bob")
+
+    limiter.success(attacker)
+    limiter.hit("ip:10.0.0.1", "user:alice", attacker)
+
+
+def test_backoff_doubles_up_to_max_delay():
+    limiter = _limiter(free_failures=0, base_delay=1, max_delay=8)
+    key = "ip-user:10.0.0.1|alice"
+    delays = []
+    for _ in range(6):
+        limiter.failure(key)
+        with pytest.raises(RateLimited) as e:
+            limiter.hit(key)
+        delays.append(round(e.value.retry_after))
+    assert delays == [2, 4, 8, 8, 8, 8]
+
+
+def test_entries_are_bounded():
+    limiter = _limiter(shards=2, max_entries=20)
+    for n in range(200):
+        limiter.hit(f"user:u{n}")
+    stats = limiter.stats()
+    assert stats["entries"] <= 20 and stats["evictions"] >= 180
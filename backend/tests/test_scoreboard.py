@@ -0,0 +1,48 @@
+"""
+Classement incrémental : comparé à un tri complet après chaque mise à jour.
+"""
+import random
+
+from app.scoreboard import Scoreboard
+
+
+def _expected(scores):
+    ranking = sorted((-score, ts, user) for user, (score, ts) in scores.items())
+    return [{"rank": i + 1, "user": user, "score": -neg} for i, (neg, _, user) in enumerate(ranking)]
+
+
+def test_matches_full_sort_across_block_splits():
+    rng = random.Random(7)
+    # blocs minuscules : les scissions et suppressions de blocs sont exercées
+    board = Scoreboard(load=4)
+    scores = {}
+    for step in range(2000):
+        user = f"u{rng.randrange(150)}"
+        if user in scores and rng.random() < 0.2:
+            delta = rng.choice((-50, 25))
+            change = board.adjust(user, delta)
+            score, ts = scores[user]
+            scores[user] = (score + delta, ts)
+        else:
+            points, ts = rng.choice((50, 100, 300)), float(step)
+            change = board.add(user, points, ts)
+            score, _ = scores.get(user, (0, ts))
+            scores[user] = (score + points, ts)
+        expected = _expected(scores)
+        assert change["rank"] == next(r["rank"] for r in expected if r["user"] == user)
+    assert board.top(len(scores)) == expected
+    assert board.top(5) == expected[:5]
+    assert all(board.rank(r["user"]) == r["rank"] for r in expected)
+    assert len(board) == len(scores)
+
+
+def test_out_of_order_solves_keep_the_latest_time():
+    board = Scoreboard()
+    board.add("a", 100, 10.0)
+    board.add("b", 100, 5.0)
+    board.add("b", 100, 20.0)
+    board.add("a", 100, 15.0)
+    # un worker en retard rapporte une résolution plus ancienne de "b"
+    board.add("b", 0, 1.0)
+    assert [r["user"] for r in board.top(2)] == ["a", "b"]
+    assert board.adjust("nobody", 10) is None
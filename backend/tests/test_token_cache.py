@@ -0,0 +1,69 @@
+"""
+Cache des jetons JWT vérifiés : succès, expiration, éviction LRU et
+invalidation par utilisateur (aussi à travers ``get_current_user``).
+"""
+import time
+from datetime import timedelta
+
+from app.core.token_cache import TokenCache
+
+API = "/api/v1"
+
+
+def test_hit_miss_and_expiry(monkeypatch):
+    cache = TokenCache(10)
+    now = time.time()
+    cache.put("t1", "alice", now + 60)
+    cache.put("t2", "bob", now + 1)
+    assert cache.get("t1") == "alice" and cache.get("unknown") is None
+
+    monkeypatch.setattr(time, "time", lambda: now + 2)
+    # expiré : retiré au passage, y compris de l'index par utilisateur
+    assert cache.get("t2") is None
+    assert cache.stats() == {"size": 1, "max_size": 10, "hits": 1, "misses": 2, "evictions": 0}
+    assert "bob" not in cache._by_user
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = TokenCache(2)
+    exp = time.time() + 60
+    cache.put("a", "alice", exp)
+    cache.put("b", "bob", exp)
+    cache.get("a")
+    cache.put("c", "carol", exp)
+    assert cache.get("b") is None and cache.get("a") == "alice" and cache.get("c") == "carol"
+    assert cache.stats()["evictions"] == 1 and "bob" not in cache._by_user
+
+
+def test_invalidate_user_drops_all_their_tokens():
+    cache = TokenCache(10)
+    exp = time.time() + 60
+    for token in ("a1", "a2", "a3"):
+        cache.put(token, "alice", exp)
+    cache.put("b1", "bob", exp)
+    cache.invalidate_user("alice")
+    assert [cache.get(t) for t in ("a1", "a2", "a3", "b1")] == [None, None, None, "bob"]
+    cache.invalidate_user("nobody")
+
+
+def test_get_current_user_uses_and_invalidates_the_cache(client):
+    from app.api.auth import create_access_token, invalidate_user_tokens
+    from app.core.token_cache import token_cache
+
+    client.post(f"{API}/auth/register", json={"username": "cached", "password": "pw-cached"})
+    token = create_access_token({"sub": "cached"}, timedelta(minutes=5))
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get(f"{API}/auth/users/me", headers=headers).json()["username"] == "cached"
+    hits = token_cache.hits
+    assert client.get(f"{API}/auth/users/me", headers=headers).status_code == 200
+    assert token_cache.hits == hits + 1
+
+    invalidate_user_tokens("cached")
+    assert token_cache.get(token) is None
+    # le jeton reste valide : il est revérifié puis remis en cache
+    assert client.get(f"{API}/auth/users/me", headers=headers).status_code == 200
+    assert token_cache.get(token) == "cached"
+
+    expired = create_access_token({"sub": "cached"}, timedelta(seconds=-1))
+    assert client.get(f"{API}/auth/users/me", headers={"Authorization": f"Bearer {expired}"}).status_code == 401
+    assert token_cache.get(expired) is None